@@ -1,6 +1,6 @@
-from flask import Flask
-from config import app, db
-from models import User, Property, Apartment, Tenant, Payment, Invoice
+import os
+from config import app
+import models  # noqa: F401  registers the models with SQLAlchemy/Alembic
 from routes.auth import auth_bp
 from routes.properties import properties_bp
 from routes.apartments import apartments_bp
@@ -10,17 +10,7 @@ from routes.invoices import invoices_bp
 from routes.notifications import notifications_bp
 from routes.reports import reports_bp
 
-# Register blueprint
-app.register_blueprint(auth_bp, url_prefix='/api')
-app.register_blueprint(properties_bp, url_prefix='/api')
-app.register_blueprint(apartments_bp, url_prefix='/api')
-app.register_blueprint(tenant_bp, url_prefix='/api/')
-app.register_blueprint(payments_bp, url_prefix='/api/payments')
-app.register_blueprint(invoices_bp, url_prefix='/api/invoices') 
-app.register_blueprint(notifications_bp, url_prefix='/api/notifications')
-app.register_blueprint(reports_bp, url_prefix='/api/reports')
-
-@app.route('/')
+
 def home():
     return {
         'message': 'Tuma Kodi API',
@@ -32,18 +22,30 @@ def home():
         }
     }
 
-@app.route('/api/health', methods=['GET'])
 def health():
     return {'status': 'ok'}, 200
 
-if __name__ == '__main__':
-    with app.app_context():
-        # Create tables
-        db.create_all()
-        # print("Database tables created/verified")
-        
-        # Check if admin exists
-        # if User.query.count() == 0:
-        #     print(" No users in database. Register first via POST /api/register")
-
-    app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
+def create_app():
+    """Register blueprints and core routes on the configured app (safe to call more than once)"""
+    if 'auth' in app.blueprints:
+        return app
+
+    # Register blueprint
+    app.register_blueprint(auth_bp, url_prefix='/api')
+    app.register_blueprint(properties_bp, url_prefix='/api')
+    app.register_blueprint(apartments_bp, url_prefix='/api')
+    app.register_blueprint(tenant_bp, url_prefix='/api/')
+    app.register_blueprint(payments_bp, url_prefix='/api/payments')
+    app.register_blueprint(invoices_bp, url_prefix='/api/invoices') 
+    app.register_blueprint(notifications_bp, url_prefix='/api/notifications')
+    app.register_blueprint(reports_bp, url_prefix='/api/reports')
+
+    app.add_url_rule('/', 'home', home)
+    app.add_url_rule('/api/health', 'health', health, methods=['GET'])
+    return app
+
+app = create_app()
+
+# Tables are managed by Alembic: run `flask --app app db upgrade` before starting
+if __name__ == '__main__' and os.getenv('FLASK_ENV') == 'development':
+    app.run(debug=True, host='0.0.0.0', port=5000)
@@ -1,36 +1,129 @@
 from flask import Flask
+from flask.json.provider import JSONProvider
 from flask_migrate import Migrate
 from flask_sqlalchemy import SQLAlchemy 
 from flask_restful import Api
 from flask_jwt_extended import JWTManager
+from flask_bcrypt import Bcrypt
+from flask_caching import Cache
 from sqlalchemy import MetaData
+from sqlalchemy.orm import raiseload
 from flask_cors import CORS
 from datetime import timedelta
+from decimal import Decimal
+import orjson
+import logging
 import os
+import uuid
 from dotenv import load_dotenv
 from urllib.parse import quote_plus
 
 load_dotenv()
 
+# Root logging is configured once here; modules only call logging.getLogger(__name__)
+logging.basicConfig(level=(os.getenv('LOG_LEVEL') or 'INFO').upper())
+
 db_user = os.getenv('DB_USERNAME')
 db_pass = os.getenv('DB_PASSWORD')
 db_host = os.getenv('DB_HOST')
 db_port = os.getenv('DB_PORT', '5432')  
 db_name = os.getenv('DB_DATABASE')
 
+def orjson_default(obj):
+    """Serialize types orjson doesn't handle natively"""
+    if isinstance(obj, Decimal):
+        return str(obj)
+    raise TypeError(f'Object of type {type(obj).__name__} is not JSON serializable')
+
+class ORJSONProvider(JSONProvider):
+    """JSON provider backed by orjson (datetime/date are serialized natively)"""
+    def _encode(self, obj):
+        option = orjson.OPT_INDENT_2 if self._app.debug else 0
+        return orjson.dumps(obj, default=orjson_default, option=option)
+
+    def dumps(self, obj, **kwargs):
+        return self._encode(obj).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        # jsonify() lands here; pass orjson's bytes straight through instead of
+        # decoding to str only for the response to encode it again
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self._encode(obj), mimetype='application/json')
+
 app = Flask(__name__)
 app.secret_key = os.getenv('SECRET_KEY')
 app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET_KEY')
 app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(hours=1) 
 app.config['JWT_REFRESH_TOKEN_EXPIRES'] = timedelta(days=30)
 
+# bcrypt cost factor (existing hashes keep verifying since the cost is stored in the hash)
+app.config['BCRYPT_LOG_ROUNDS'] = int(
+    os.getenv('BCRYPT_LOG_ROUNDS') or (10 if os.getenv('FLASK_ENV') == 'development' else 12)
+)
+
+# Unplanned lazy loads raise instead of querying (on by default in development)
+app.config['STRICT_LOADING'] = (
+    os.getenv('STRICT_LOADING') or ('true' if os.getenv('FLASK_ENV') == 'development' else 'false')
+).lower() == 'true'
+
 # Database URL
 # app.config['SQLALCHEMY_DATABASE_URI'] = f'postgresql://{db_user}:{db_pass}@{db_host}:{db_port}/{db_name}'
 # print(f"Database URL: {app.config['SQLALCHEMY_DATABASE_URI']}")
-app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL') or \
+database_url = os.getenv('DATABASE_URL') or \
     f'postgresql://{db_user}:{quote_plus(db_pass)}@{db_host}:{db_port}/{db_name}'
 
-app.json.compact = False
+# Use the psycopg 3 driver (Render hands out postgres:// URLs)
+if database_url.startswith('postgres://'):
+    database_url = database_url.replace('postgres://', 'postgresql+psycopg://', 1)
+elif database_url.startswith('postgresql://'):
+    database_url = database_url.replace('postgresql://', 'postgresql+psycopg://', 1)
+
+app.config['SQLALCHEMY_DATABASE_URI'] = database_url
+
+# Connection pool: reuse connections across requests and drop stale ones after DB restarts.
+# Each gunicorn worker gets its own pool, so by default DB_MAX_CONNECTIONS (kept below
+# Postgres' max_connections of 100, leaving room for migrations and psql) is split
+# across the workers, half kept open and half as overflow
+db_workers = int(os.getenv('GUNICORN_WORKERS') or 1)
+db_pool_default = max(int(os.getenv('DB_MAX_CONNECTIONS') or 80) // db_workers // 2, 1)
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+    'pool_size': int(os.getenv('DB_POOL_SIZE') or db_pool_default),
+    'max_overflow': int(os.getenv('DB_MAX_OVERFLOW') or db_pool_default),
+    'pool_timeout': int(os.getenv('DB_POOL_TIMEOUT') or 30),
+    'pool_pre_ping': True,
+    'pool_recycle': 1800,
+    'pool_use_lifo': True,
+}
+
+# DB_ECHO_POOL=debug logs every checkout and checkin, to see whether requests
+# queue for connections under load; info logs only invalidations and recycles.
+# Any other value is ignored with a warning rather than stopping the app booting
+db_echo_pool = (os.getenv('DB_ECHO_POOL') or '').upper()
+if db_echo_pool in ('DEBUG', 'INFO'):
+    logging.getLogger('sqlalchemy.pool').setLevel(db_echo_pool)
+elif db_echo_pool:
+    logging.getLogger(__name__).warning("Ignoring DB_ECHO_POOL=%s, expected debug or info", os.getenv('DB_ECHO_POOL'))
+
+# TCP keepalives stop idle connections being dropped silently by NATs/load balancers
+if database_url.startswith('postgresql'):
+    connect_args = {
+        'keepalives': 1,
+        'keepalives_idle': 60,
+        'keepalives_interval': 10,
+        'keepalives_count': 5,
+    }
+    if os.getenv('DB_SSLMODE'):
+        connect_args['sslmode'] = os.getenv('DB_SSLMODE')
+    # PgBouncer in transaction mode can hand each transaction a different server
+    # connection, so psycopg must not use server-side prepared statements
+    if os.getenv('DB_PGBOUNCER', 'false').lower() == 'true':
+        connect_args['prepare_threshold'] = None
+    app.config['SQLALCHEMY_ENGINE_OPTIONS']['connect_args'] = connect_args
+
+app.json = ORJSONProvider(app)
 
 metadata = MetaData(
     naming_convention={
@@ -46,6 +139,51 @@ migrate = Migrate(app, db)
 db.init_app(app)
 api = Api(app)
 jwt = JWTManager(app)
+bcrypt = Bcrypt(app)
+
+# Response cache: shared Redis when REDIS_URL is set, otherwise per-process memory
+redis_url = os.getenv('REDIS_URL')
+cache = Cache(app, config={
+    'CACHE_TYPE': 'RedisCache' if redis_url else 'SimpleCache',
+    'CACHE_REDIS_URL': redis_url,
+    'CACHE_DEFAULT_TIMEOUT': 30,
+})
+# Only Redis is seen by every worker; without it, invalidating a key clears
+# it in the current process alone
+SHARED_CACHE = bool(redis_url)
+
+def cache_version(key):
+    """Version token stored at key. A missing one (never set, or evicted by
+    SimpleCache) is replaced by a fresh token rather than a fixed default, so
+    entries cached under an earlier version can never be served again"""
+    version = cache.get(key)
+    if version is None:
+        version = uuid.uuid4().hex
+        if not cache.add(key, version, timeout=0):
+            version = cache.get(key) or version
+    return version
+
+# Cache TTLs (seconds) for read endpoints
+CACHE_TIMEOUT_SHORT = 15
+CACHE_TIMEOUT_NORMAL = 30
+CACHE_TIMEOUT_LONG = 300
+
+def strict_loading_options():
+    """raiseload('*') when STRICT_LOADING is on, so a missing eager load fails loudly"""
+    return (raiseload('*'),) if app.config['STRICT_LOADING'] else ()
+
+def cache_successful(rv):
+    """Only cache (body, 200) responses"""
+    return isinstance(rv, tuple) and rv[1] == 200
+
+# Revoked token ids live in the cache until the token would have expired anyway
+def blocklist_key(jti):
+    return f"jwt:blocklist:{jti}"
+
+@jwt.token_in_blocklist_loader
+def token_in_blocklist(jwt_header, jwt_payload):
+    return cache.has(blocklist_key(jwt_payload['jti']))
+
 allowed_origins = [
     "http://localhost:5173",
     "https://tuma-kodi.vercel.app", 
@@ -0,0 +1,32 @@
+import multiprocessing
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Bind address
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:5000')
+
+# Workers (2 x cores + 1) using gevent so requests overlap on network waits
+workers = int(os.getenv('GUNICORN_WORKERS') or multiprocessing.cpu_count() * 2 + 1)
+worker_class = 'gevent'
+# Workers size their database pools from this (see config.py)
+os.environ['GUNICORN_WORKERS'] = str(workers)
+worker_connections = 1000
+
+# Revoked tokens, cache invalidation and SMS job status live in the cache. Without
+# Redis each worker has its own copy, so a logout on one worker would not be
+# seen by the others; refuse to start rather than run like that
+if workers > 1 and not os.getenv('REDIS_URL'):
+    raise RuntimeError(
+        'REDIS_URL is required when running more than one gunicorn worker '
+        '(set GUNICORN_WORKERS=1 to run without Redis)'
+    )
+
+keepalive = 5
+timeout = 120
+
+# No preload_app: each gevent worker must monkey-patch before the app (ssl,
+# threading, the SMS executors) is imported. Migrations run before gunicorn
+# starts (see the Dockerfile CMD), so nothing needs to happen pre-fork
+preload_app = False
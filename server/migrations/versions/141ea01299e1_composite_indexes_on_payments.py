@@ -0,0 +1,35 @@
+"""composite indexes on payments
+
+Revision ID: 141ea01299e1
+Revises: c1f33b293d8c
+Create Date: 2026-10-15 17:49:17.619024
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '141ea01299e1'
+down_revision = 'c1f33b293d8c'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # CONCURRENTLY keeps the payments table writable while the indexes build on
+    # Postgres; it can't run inside a transaction, hence the autocommit block
+    with op.get_context().autocommit_block():
+        op.create_index('ix_payment_apt_date', 'payments', ['apartment_id', sa.literal_column('payment_date DESC')],
+                        unique=False, postgresql_concurrently=True)
+        op.create_index('ix_payment_apt_status', 'payments', ['apartment_id', 'status'],
+                        unique=False, postgresql_concurrently=True)
+        op.create_index('ix_payment_apt_month', 'payments', ['apartment_id', 'month_paid_for'],
+                        unique=False, postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_payment_apt_month', table_name='payments', postgresql_concurrently=True)
+        op.drop_index('ix_payment_apt_status', table_name='payments', postgresql_concurrently=True)
+        op.drop_index('ix_payment_apt_date', table_name='payments', postgresql_concurrently=True)
@@ -0,0 +1,35 @@
+"""Store payment month_paid_for as a date
+
+Revision ID: 5b8d0c6e2f41
+Revises: 141ea01299e1
+Create Date: 2026-10-15 18:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b8d0c6e2f41'
+down_revision = '141ea01299e1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # 'YYYY-MM' strings become the first day of that month
+    if op.get_bind().dialect.name == 'postgresql':
+        op.alter_column('payments', 'month_paid_for', existing_type=sa.String(length=7), type_=sa.Date(),
+                        postgresql_using="to_date(month_paid_for || '-01', 'YYYY-MM-DD')")
+    else:
+        # SQLite doesn't enforce column types, and a batch copy would CAST the
+        # dates to numbers, so only the stored values are rewritten
+        op.execute("UPDATE payments SET month_paid_for = month_paid_for || '-01' WHERE length(month_paid_for) = 7")
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.alter_column('payments', 'month_paid_for', existing_type=sa.Date(), type_=sa.String(length=7),
+                        postgresql_using="to_char(month_paid_for, 'YYYY-MM')")
+    else:
+        op.execute("UPDATE payments SET month_paid_for = substr(month_paid_for, 1, 7)")
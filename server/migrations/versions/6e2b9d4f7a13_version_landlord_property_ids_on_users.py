@@ -0,0 +1,28 @@
+"""version landlord property ids on users
+
+Revision ID: 6e2b9d4f7a13
+Revises: d3a8f2c61e07
+Create Date: 2026-10-16 09:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6e2b9d4f7a13'
+down_revision = 'd3a8f2c61e07'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Existing rows start at 1 so access tokens issued before this column,
+    # whose version claim was 0 or a cache token, fall back to the database
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('properties_version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_column('properties_version')
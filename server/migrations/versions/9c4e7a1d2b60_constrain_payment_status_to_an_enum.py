@@ -0,0 +1,43 @@
+"""Constrain payment status to an enum
+
+Revision ID: 9c4e7a1d2b60
+Revises: 5b8d0c6e2f41
+Create Date: 2026-10-15 19:10:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '9c4e7a1d2b60'
+down_revision = '5b8d0c6e2f41'
+branch_labels = None
+depends_on = None
+
+payment_status = postgresql.ENUM('completed', 'pending', 'partial', name='payment_status')
+
+
+def upgrade():
+    op.execute("UPDATE payments SET status = 'pending' WHERE status IS NULL")
+    if op.get_bind().dialect.name == 'postgresql':
+        payment_status.create(op.get_bind(), checkfirst=True)
+        op.alter_column('payments', 'status', existing_type=sa.String(length=50), type_=payment_status,
+                        nullable=False, postgresql_using='status::payment_status')
+    else:
+        with op.batch_alter_table('payments', schema=None) as batch_op:
+            batch_op.alter_column('status', existing_type=sa.String(length=50),
+                                  type_=sa.Enum('completed', 'pending', 'partial', name='payment_status'),
+                                  nullable=False)
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.alter_column('payments', 'status', existing_type=payment_status, type_=sa.String(length=50),
+                        nullable=True, postgresql_using='status::text')
+        payment_status.drop(op.get_bind(), checkfirst=True)
+    else:
+        with op.batch_alter_table('payments', schema=None) as batch_op:
+            batch_op.alter_column('status', existing_type=sa.Enum('completed', 'pending', 'partial', name='payment_status'),
+                                  type_=sa.String(length=50), nullable=True)
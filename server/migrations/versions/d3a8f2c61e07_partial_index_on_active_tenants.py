@@ -0,0 +1,29 @@
+"""partial index on active tenants
+
+Revision ID: d3a8f2c61e07
+Revises: 9c4e7a1d2b60
+Create Date: 2026-10-15 19:40:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd3a8f2c61e07'
+down_revision = '9c4e7a1d2b60'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Built CONCURRENTLY on Postgres so tenant writes aren't blocked
+    with op.get_context().autocommit_block():
+        op.create_index('ix_tenant_active_apartment', 'tenants', ['apartment_id'], unique=False,
+                        postgresql_where=sa.text("status = 'active'"), sqlite_where=sa.text("status = 'active'"),
+                        postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_tenant_active_apartment', table_name='tenants', postgresql_concurrently=True)
@@ -0,0 +1,63 @@
+"""Case-insensitive unique index on users email
+
+Revision ID: e47e064bd013
+Revises: 8f95aff384a3
+Create Date: 2026-10-15 17:40:12.418305
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e47e064bd013'
+down_revision = '8f95aff384a3'
+branch_labels = None
+depends_on = None
+
+
+# Accounts whose emails differ only by case; lowercasing them would break the
+# existing unique constraint on users.email
+DUPLICATE_EMAILS = sa.text("""
+    SELECT u.id, u.email, u.role
+    FROM users u
+    JOIN (
+        SELECT lower(email) AS email FROM users
+        WHERE email IS NOT NULL
+        GROUP BY lower(email) HAVING COUNT(*) > 1
+    ) d ON d.email = lower(u.email)
+    ORDER BY lower(u.email), u.id
+""")
+
+
+def check_no_duplicate_emails():
+    # Registration used to compare emails as typed, so the same address could be
+    # registered twice in different case. Stop with a report rather than fail
+    # part way through the UPDATE (or merge accounts that may own properties)
+    rows = op.get_bind().execute(DUPLICATE_EMAILS).all()
+    if not rows:
+        return
+    groups = {}
+    for row in rows:
+        groups.setdefault(row.email.lower(), []).append(f"{row.id} ({row.email}, {row.role})")
+    report = '\n'.join(f"  {email}: users {', '.join(users)}" for email, users in groups.items())
+    raise RuntimeError(
+        f"Cannot add ix_users_email_lower: {len(groups)} emails are used by more than one account when case is ignored.\n"
+        f"{report}\n"
+        "Keep one account per email (move its properties/tenants over if needed), delete or rename the others, "
+        "then rerun `flask db upgrade`."
+    )
+
+
+def upgrade():
+    # Offline (--sql) runs can't query, so the check only runs against a live database
+    if not op.get_context().as_sql:
+        check_no_duplicate_emails()
+
+    # Expression indexes aren't picked up by autogenerate, so this one is written by hand
+    op.execute("UPDATE users SET email = lower(email) WHERE email <> lower(email)")
+    op.create_index('ix_users_email_lower', 'users', [sa.text('lower(email)')], unique=True)
+
+
+def downgrade():
+    op.drop_index('ix_users_email_lower', table_name='users')
@@ -1,7 +1,22 @@
-from datetime import datetime
-from config import db
+from datetime import datetime, date
+from config import db, bcrypt
 from flask_sqlalchemy import SQLAlchemy
-from flask_bcrypt import Bcrypt
+
+class YearMonth(db.TypeDecorator):
+    """'YYYY-MM' strings in Python, stored as a DATE on the first of the month"""
+    impl = db.Date
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None or isinstance(value, date):
+            return value
+        return datetime.strptime(value, '%Y-%m').date()
+
+    def process_result_value(self, value, dialect):
+        return value.strftime('%Y-%m') if value is not None else None
+
+# Payment.status values; a native enum on Postgres
+PAYMENT_STATUSES = ('completed', 'pending', 'partial')
 
 class User(db.Model):
     __tablename__ = 'users'
@@ -16,16 +31,25 @@ class User(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     is_active = db.Column(db.Boolean, default=True)
+    # Bumped whenever the landlord gains or loses a property; access tokens carry
+    # the version their property_ids claim was read at. Starts at 1 so tokens
+    # issued before the column existed (version 0 or a cache token) are re-checked
+    properties_version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+
+    # Case-insensitive uniqueness; lookups compare lower(email) so this index is used
+    __table_args__ = (
+        db.Index('ix_users_email_lower', db.func.lower(email), unique=True),
+    )
     
     # Relationships
-    properties = db.relationship('Property', backref='landlord', lazy=True)
-    tenant_profile = db.relationship('Tenant', backref='user', uselist=False, lazy=True)
+    properties = db.relationship('Property', back_populates='landlord', lazy='select')
+    tenant_profile = db.relationship('Tenant', back_populates='user', uselist=False, lazy='select')
 
     def set_password(self,password):
-        self.password_hash = Bcrypt().generate_password_hash(password).decode('utf-8')
+        self.password_hash = bcrypt.generate_password_hash(password).decode('utf-8')
 
     def check_password(self,password):
-        return Bcrypt().check_password_hash(self.password_hash,password)
+        return bcrypt.check_password_hash(self.password_hash,password)
     
     def to_dict(self):
         return {
@@ -35,8 +59,8 @@ class User(db.Model):
             'last_name': self.last_name,
             'phone': self.phone,
             'role': self.role,
-            'created_at': self.created_at.isoformat(),
-            'updated_at': self.updated_at.isoformat(),
+            'created_at': self.created_at,
+            'updated_at': self.updated_at,
             'is_active': self.is_active
         }
     
@@ -44,7 +68,7 @@ class Property(db.Model):
     __tablename__ = 'properties'
     
     id = db.Column(db.Integer, primary_key=True)
-    landlord_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    landlord_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
     name = db.Column(db.String(255), nullable=False)
     address = db.Column(db.Text, nullable=False)
     city = db.Column(db.String(100))
@@ -54,7 +78,8 @@ class Property(db.Model):
     status = db.Column(db.String(50), default='active')
     
     # Relationships
-    apartments = db.relationship('Apartment', backref='property', lazy=True)
+    landlord = db.relationship('User', back_populates='properties')
+    apartments = db.relationship('Apartment', back_populates='property', lazy='select')
 
     def to_dict(self):
         return {
@@ -64,13 +89,17 @@ class Property(db.Model):
             'address': self.address,
             'city': self.city,
             'total_units': self.total_units,
-            'created_at': self.created_at.isoformat(),
-            'updated_at': self.updated_at.isoformat(),
+            'created_at': self.created_at,
+            'updated_at': self.updated_at,
             'status': self.status
         }
 
 class Apartment(db.Model):
     __tablename__ = 'apartments'
+    __table_args__ = (
+        # Also serves property_id-only lookups (leading column)
+        db.Index('ix_apartments_property_status', 'property_id', 'status'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     property_id = db.Column(db.Integer, db.ForeignKey('properties.id'), nullable=False)
@@ -85,9 +114,10 @@ class Apartment(db.Model):
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Relationships
-    tenant = db.relationship('Tenant', backref='apartment', uselist=False, lazy=True)
-    payments = db.relationship('Payment', back_populates="apartment", cascade="all, delete-orphan")
-    invoices = db.relationship('Invoice', backref='apartment', lazy=True)
+    property = db.relationship('Property', back_populates='apartments')
+    tenant = db.relationship('Tenant', back_populates='apartment', uselist=False, lazy='select')
+    payments = db.relationship('Payment', back_populates="apartment", cascade="all, delete-orphan", lazy='raise')
+    invoices = db.relationship('Invoice', back_populates='apartment', lazy='raise')
 
     def to_dict(self):
         return {
@@ -95,21 +125,27 @@ class Apartment(db.Model):
             'property_id': self.property_id,
             'apartment_number': self.apartment_number,
             'apartment_type': self.apartment_type,
-            'rent_amount': str(self.rent_amount),
-            'deposit_amount': str(self.deposit_amount),
+            'rent_amount': self.rent_amount,
+            'deposit_amount': self.deposit_amount,
             'size_sqft': self.size_sqft,
             'features': self.features,
             'status': self.status,
-            'created_at': self.created_at.isoformat(),
-            'updated_at': self.updated_at.isoformat()
+            'created_at': self.created_at,
+            'updated_at': self.updated_at
         }
 
 class Tenant(db.Model):
     __tablename__ = 'tenants'
+    __table_args__ = (
+        # Active tenant of an apartment (payment callbacks, unit lists); only
+        # active rows are indexed, so the lookup is a single small probe
+        db.Index('ix_tenant_active_apartment', 'apartment_id',
+                 postgresql_where=db.text("status = 'active'"), sqlite_where=db.text("status = 'active'")),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-    apartment_id = db.Column(db.Integer, db.ForeignKey('apartments.id'))
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    apartment_id = db.Column(db.Integer, db.ForeignKey('apartments.id'), index=True)
     lease_start_date = db.Column(db.Date, nullable=False)
     lease_end_date = db.Column(db.Date)
     monthly_rent = db.Column(db.Numeric(10, 2), nullable=False)
@@ -125,8 +161,10 @@ class Tenant(db.Model):
 
     
     # Relationships
-    payments = db.relationship('Payment', back_populates="tenant", cascade="all, delete-orphan")
-    invoices = db.relationship('Invoice', backref='tenant', lazy=True)
+    user = db.relationship('User', back_populates='tenant_profile')
+    apartment = db.relationship('Apartment', back_populates='tenant', lazy='select')
+    payments = db.relationship('Payment', back_populates="tenant", cascade="all, delete-orphan", lazy='raise')
+    invoices = db.relationship('Invoice', back_populates='tenant', lazy='raise')
     def to_dict(self):  
         return {
             'id': self.id,
@@ -134,15 +172,15 @@ class Tenant(db.Model):
             'apartment_id': self.apartment_id,
             'apartment_number': self.apartment.apartment_number if self.apartment else None,
             'property_name': self.apartment.property.name if self.apartment and self.apartment.property else None,
-            'lease_start_date': self.lease_start_date.isoformat(),
-            'lease_end_date': self.lease_end_date.isoformat() if self.lease_end_date else None,
-            'monthly_rent': str(self.monthly_rent),
-            'security_deposit_paid': str(self.security_deposit_paid),
+            'lease_start_date': self.lease_start_date,
+            'lease_end_date': self.lease_end_date,
+            'monthly_rent': self.monthly_rent,
+            'security_deposit_paid': self.security_deposit_paid,
             'emergency_contact': self.emergency_contact,
             'id_number': self.id_number,
             'status': self.status,
-            'created_at': self.created_at.isoformat(),
-            'updated_at': self.updated_at.isoformat(),
+            'created_at': self.created_at,
+            'updated_at': self.updated_at,
             'name': self.name,
             'email': self.email,
             'phone': self.phone
@@ -150,16 +188,16 @@ class Tenant(db.Model):
 class Payment(db.Model):
     __tablename__ = 'payments'
     id = db.Column(db.Integer, primary_key=True)
-    tenant_id = db.Column(db.Integer, db.ForeignKey('tenants.id'), nullable=False)
-    apartment_id = db.Column(db.Integer, db.ForeignKey('apartments.id'))
+    tenant_id = db.Column(db.Integer, db.ForeignKey('tenants.id'), nullable=False, index=True)
+    apartment_id = db.Column(db.Integer, db.ForeignKey('apartments.id'), index=True)
     payment_date = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     tenant_name =  db.Column(db.String(100), nullable=False)
     apartment_number = db.Column(db.String(10), nullable=False)
     amount = db.Column(db.Numeric(10, 2), nullable=False)
     mpesa_receipt_number = db.Column(db.String(100), unique=True)
     payment_method = db.Column(db.String(50), default='mpesa')
-    month_paid_for = db.Column(db.String(7),)
-    status = db.Column(db.String(50), default='pending')
+    month_paid_for = db.Column(YearMonth, index=True)
+    status = db.Column(db.Enum(*PAYMENT_STATUSES, name='payment_status'), nullable=False, default='pending')
     phone_number = db.Column(db.String(20), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -169,15 +207,22 @@ class Payment(db.Model):
     apartment = db.relationship('Apartment', back_populates="payments")
     invoice = db.relationship('Invoice',back_populates="payment", uselist=False)
 
+    __table_args__ = (
+        # Landlord payment list: per-apartment filters and newest-first ordering
+        db.Index('ix_payment_apt_date', 'apartment_id', payment_date.desc()),
+        db.Index('ix_payment_apt_status', 'apartment_id', 'status'),
+        db.Index('ix_payment_apt_month', 'apartment_id', 'month_paid_for'),
+    )
+
     def to_dict(self):
         return {
             'id': self.id,
             'tenant_id': self.tenant_id,
             'apartment_id': self.apartment_id,
-            'payment_date': self.payment_date.isoformat(),
+            'payment_date': self.payment_date,
             'tenant_name': self.tenant_name,
             'apartment_number': self.apartment_number,
-            'amount': str(self.amount),
+            'amount': self.amount,
             'mpesa_receipt_number': self.mpesa_receipt_number,
             'payment_method': self.payment_method,
             'month_paid_for': self.month_paid_for,
@@ -190,8 +235,8 @@ class Invoice(db.Model):
     __tablename__ = 'invoices'
     
     id = db.Column(db.Integer, primary_key=True)
-    tenant_id = db.Column(db.Integer, db.ForeignKey('tenants.id'), nullable=False)
-    apartment_id = db.Column(db.Integer, db.ForeignKey('apartments.id'))
+    tenant_id = db.Column(db.Integer, db.ForeignKey('tenants.id'), nullable=False, index=True)
+    apartment_id = db.Column(db.Integer, db.ForeignKey('apartments.id'), index=True)
     invoice_number = db.Column(db.String(100), unique=True, nullable=False)
     month_year = db.Column(db.String(7), nullable=False)
     rent_amount = db.Column(db.Numeric(10, 2), nullable=False)
@@ -205,4 +250,15 @@ class Invoice(db.Model):
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Relationship
-    payment = db.relationship('Payment', back_populates="invoice")
\ No newline at end of file
+    tenant = db.relationship('Tenant', back_populates='invoices')
+    apartment = db.relationship('Apartment', back_populates='invoices')
+    payment = db.relationship('Payment', back_populates="invoice", lazy='selectin')
+
+    __table_args__ = (
+        # One invoice per tenant per month
+        db.UniqueConstraint('tenant_id', 'month_year', name='uq_invoice_tenant_month'),
+        # Filtered invoice lookups, and the newest-first invoice list per tenant
+        db.Index('ix_invoice_tenant_month_status', 'tenant_id', 'month_year', 'status'),
+        db.Index('ix_invoice_tenant_created', tenant_id, created_at.desc(),
+                 postgresql_include=['invoice_number', 'total_amount']),
+    )
\ No newline at end of file
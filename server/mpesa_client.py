@@ -1,11 +1,27 @@
 import os
+import re
 import base64
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from datetime import datetime
 from dotenv import load_dotenv
+from config import cache
 
 load_dotenv()
 
+# Shared across gunicorn workers when the cache is Redis-backed
+TOKEN_CACHE_KEY = 'mpesa:access_token'
+TOKEN_TTL = 55 * 60
+
+# (connect, read) seconds, so a stalled Safaricom endpoint can't pin a worker
+REQUEST_TIMEOUT = (3, 10)
+
+# Separators stripped from phone numbers in a single pass
+PHONE_STRIP_TABLE = str.maketrans('', '', ' +-')
+# 254 followed by a Safaricom/Airtel prefix (7 or 1) and 8 more digits
+KENYAN_PHONE_RE = re.compile(r'^254[71]\d{8}$')
+
 class MpesaClient:
     """
     M-Pesa Daraja API Client
@@ -25,39 +41,46 @@ class MpesaClient:
             self.base_url = 'https://sandbox.safaricom.co.ke'
         else:
             self.base_url = 'https://api.safaricom.co.ke'
-        
-        self.access_token = None
-        self.token_expiry = None
+
+        # Keep-alive session so calls reuse the TLS connection to Safaricom.
+        # Retries only cover idempotent methods, so an STK push is never resent
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=10,
+            pool_maxsize=20,
+            max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[502, 503, 504])
+        )
+        self.session.mount('https://', adapter)
     
     def get_access_token(self):
         """
         Get OAuth access token from M-Pesa
-        Token is valid for 1 hour
+        Token is valid for 1 hour and is cached for 55 minutes
         """
         # Check if we have a valid token
-        if self.access_token and self.token_expiry:
-            if datetime.now() < self.token_expiry:
-                return self.access_token
+        access_token = cache.get(TOKEN_CACHE_KEY)
+        if access_token:
+            return access_token
         
         # Get new token
         url = f'{self.base_url}/oauth/v1/generate?grant_type=client_credentials'
         
         try:
-            response = requests.get(
+            response = self.session.get(
                 url,
-                auth=(self.consumer_key, self.consumer_secret)
+                auth=(self.consumer_key, self.consumer_secret),
+                timeout=REQUEST_TIMEOUT
             )
             response.raise_for_status()
             
             data = response.json()
-            self.access_token = data['access_token']
+            access_token = data['access_token']
+            cache.set(TOKEN_CACHE_KEY, access_token, timeout=TOKEN_TTL)
             
-
-            from datetime import timedelta
-            self.token_expiry = datetime.now() + timedelta(minutes=55)
-            
-            return self.access_token
+            return access_token
             
+        except requests.exceptions.Timeout:
+            raise Exception("Access token request to M-Pesa timed out; retry")
         except requests.exceptions.RequestException as e:
             raise Exception(f"Failed to get access token: {str(e)}")
     
@@ -117,10 +140,12 @@ class MpesaClient:
         }
         
         try:
-            response = requests.post(url, json=payload, headers=headers)
+            response = self.session.post(url, json=payload, headers=headers, timeout=REQUEST_TIMEOUT)
             response.raise_for_status()
             return response.json()
             
+        except requests.exceptions.Timeout:
+            raise Exception("STK Push to M-Pesa timed out; retry")
         except requests.exceptions.RequestException as e:
             raise Exception(f"STK Push failed: {str(e)}")
     
@@ -154,10 +179,12 @@ class MpesaClient:
         }
         
         try:
-            response = requests.post(url, json=payload, headers=headers)
+            response = self.session.post(url, json=payload, headers=headers, timeout=REQUEST_TIMEOUT)
             response.raise_for_status()
             return response.json()
             
+        except requests.exceptions.Timeout:
+            raise Exception("STK status query to M-Pesa timed out; retry")
         except requests.exceptions.RequestException as e:
             raise Exception(f"Query failed: {str(e)}")
     
@@ -166,15 +193,15 @@ class MpesaClient:
         Format phone number to 254XXXXXXXXX format
         """
         # Remove spaces and special characters
-        phone_number = phone_number.replace(' ', '').replace('+', '').replace('-', '')
+        phone_number = phone_number.translate(PHONE_STRIP_TABLE)
         
         # Convert to 254 format
-        if phone_number.startswith('0'):
-            phone_number = f'254{phone_number[1:]}'
-        elif phone_number.startswith('254'):
-            pass
-        elif phone_number.startswith('7') or phone_number.startswith('1'):
-            phone_number = f'254{phone_number}'
+        if phone_number[:1] == '0':
+            return f'254{phone_number[1:]}'
+        if phone_number[:3] == '254':
+            return phone_number
+        if phone_number[:1] in ('7', '1'):
+            return f'254{phone_number}'
         
         return phone_number
     
@@ -183,14 +210,7 @@ class MpesaClient:
         Validate Kenyan phone number
         """
         formatted = self._format_phone_number(phone_number)
-        
-        # Should be 12 digits starting with 254
-        if len(formatted) == 12 and formatted.startswith('254'):
-            # Should start with 2547 or 2541 (Safaricom/Airtel)
-            if formatted.startswith('2547') or formatted.startswith('2541'):
-                return True
-        
-        return False
+        return KENYAN_PHONE_RE.match(formatted) is not None
 
 
 mpesa_client = MpesaClient()
\ No newline at end of file
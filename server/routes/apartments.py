@@ -1,20 +1,86 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, Response
 from flask_jwt_extended import jwt_required, get_jwt_identity
+from sqlalchemy import select
+from sqlalchemy.orm import contains_eager, raiseload, load_only
 from models import Apartment, Property
-from config import db
+from config import db, cache, cache_successful, cache_version, orjson_default, SHARED_CACHE, CACHE_TIMEOUT_SHORT, CACHE_TIMEOUT_LONG
 from datetime import datetime
+import orjson
+import uuid
 
 # Blueprint for apartment routes
 apartments_bp = Blueprint('apartments', __name__)   
+
+# Cached apartment lists are keyed by a per-landlord version, so bumping the
+# version invalidates every filtered variant at once
+def apartments_cache_version(landlord_id):
+    return cache_version(f'apartments:{landlord_id}:version')
+
+def apartments_cache_key():
+    landlord_id = get_jwt_identity()
+    version = apartments_cache_version(landlord_id)
+    return f"apartments:{landlord_id}:{version}:{request.query_string.decode()}"
+
+def invalidate_apartments_cache(landlord_id):
+    cache.set(f'apartments:{landlord_id}:version', uuid.uuid4().hex, timeout=0)
+
+# M-Pesa callbacks find the unit by its account number. The id is cached per
+# number and dropped whenever a unit with that number is added, renamed or deleted.
+# The cache is only used with Redis: a per-worker copy could outlive a rename made
+# on another worker and credit rent to the wrong unit
+def apartment_number_cache_key(apartment_number):
+    return f"apartments:number:{apartment_number}"
+
+def get_apartment_id_by_number(apartment_number):
+    key = apartment_number_cache_key(apartment_number)
+    apartment_id = cache.get(key) if SHARED_CACHE else None
+    if apartment_id is None:
+        apartment_id = db.session.scalar(
+            select(Apartment.id).filter_by(apartment_number=apartment_number).limit(1)
+        )
+        if apartment_id is not None and SHARED_CACHE:
+            cache.set(key, apartment_id, timeout=CACHE_TIMEOUT_LONG)
+    return apartment_id
+
+def invalidate_apartment_numbers(*apartment_numbers):
+    cache.delete_many(*(apartment_number_cache_key(number) for number in apartment_numbers))
+
+# Columns a client may request through ?fields=
+APARTMENT_FIELDS = (
+    'id', 'property_id', 'apartment_number', 'apartment_type', 'rent_amount',
+    'deposit_amount', 'size_sqft', 'features', 'status', 'created_at', 'updated_at'
+)
+
+# Rows fetched per round-trip when listing apartments
+APARTMENTS_BATCH_SIZE = 500
+
 # get all apartments for a property
 @apartments_bp.route('/apartments', methods=['GET'])
 @jwt_required()
+@cache.cached(timeout=CACHE_TIMEOUT_SHORT, make_cache_key=apartments_cache_key, response_filter=cache_successful)
 def get_all_apartments():
     try:
         landlord_id = get_jwt_identity() 
 
-        # Start query to get apartments for the landlord's properties
-        query = Apartment.query.join(Property).filter(Property.landlord_id == landlord_id)
+        # Optional field selection e.g. ?fields=apartment_number,rent_amount,status
+        fields = None
+        if request.args.get('fields'):
+            fields = ['id'] + [f for f in request.args['fields'].split(',') if f != 'id']
+            invalid = [f for f in fields if f not in APARTMENT_FIELDS]
+            if invalid:
+                return jsonify({'error': f'Invalid fields: {", ".join(invalid)}'}), 400
+
+        # Start query to get apartments for the landlord's properties.
+        # The joined property row hydrates apartment.property, and any other
+        # lazy load raises instead of quietly issuing a query per apartment
+        query = Apartment.query.join(Apartment.property).options(
+            contains_eager(Apartment.property).load_only(Property.id, Property.landlord_id),
+            raiseload('*')
+        ).filter(Property.landlord_id == landlord_id)
+
+        # Only SELECT the columns being returned
+        if fields:
+            query = query.options(load_only(*[getattr(Apartment, f) for f in fields], raiseload=True))
 
         # Optional query params
         status = request.args.get('status')
@@ -25,10 +91,19 @@ def get_all_apartments():
         if property_id:
             query = query.filter(Apartment.property_id == int(property_id))
 
-        apartments = query.all()
-        apartments_list = [apt.to_dict() for apt in apartments]
+        if fields:
+            serialize = lambda apt: {f: getattr(apt, f) for f in fields}
+        else:
+            serialize = Apartment.to_dict
+
+        # Fetch in batches and encode row by row, so neither the full ORM result
+        # nor a list of dicts is held in memory alongside the response body
+        rows = query.yield_per(APARTMENTS_BATCH_SIZE)
+        body = b'{"apartments":[' + b','.join(
+            orjson.dumps(serialize(apt), default=orjson_default) for apt in rows
+        ) + b']}'
 
-        return jsonify({'apartments': apartments_list}), 200
+        return Response(body, mimetype='application/json'), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -48,6 +123,7 @@ def update_apartment(apt_id):
             return jsonify({'error': 'Apartment not found'}), 404
 
         data = request.get_json()
+        old_number = apartment.apartment_number
 
         if 'apartment_number' in data and str(data['apartment_number']).strip():
             apartment.apartment_number = str(data['apartment_number']).strip()
@@ -65,7 +141,10 @@ def update_apartment(apt_id):
             apartment.status = data['status']
 
         apartment.updated_at = datetime.utcnow()
+        new_number = apartment.apartment_number
         db.session.commit()
+        invalidate_apartments_cache(landlord_id)
+        invalidate_apartment_numbers(old_number, new_number)
 
         return jsonify({'message': 'Apartment updated successfully', 'unit': apartment.to_dict()}), 200
 
@@ -89,8 +168,11 @@ def delete_apartment(apt_id):
         if not apartment:
             return jsonify({'error': 'Apartment not found'}), 404
 
+        apartment_number = apartment.apartment_number
         db.session.delete(apartment)
         db.session.commit()
+        invalidate_apartments_cache(landlord_id)
+        invalidate_apartment_numbers(apartment_number)
 
         return jsonify({'message': 'Apartment deleted successfully'}), 200
 
@@ -1,67 +1,141 @@
-from flask import Blueprint, request, jsonify
-from flask_jwt_extended import create_access_token, create_refresh_token, jwt_required, get_jwt_identity
-from models import User
-from config import db
+from flask import Blueprint, request, jsonify, g
+from flask_jwt_extended import create_access_token, create_refresh_token, jwt_required, get_jwt_identity, get_jwt
+from models import User, Property
+from config import db, cache, cache_successful, blocklist_key, CACHE_TIMEOUT_NORMAL
+from sqlalchemy import select, update, literal
+from sqlalchemy.orm import selectinload
 from datetime import datetime
+import time
 import re
 
 # Blueprint for auth routes
 auth_bp = Blueprint('auth', __name__)
 
 
+EMAIL_RE = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+PHONE_RE = re.compile(r'^\+?1?\d{9,15}$')
+
 #Email validation function
 def is_valid_email(email):
-    pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-    return re.match(pattern, email) is not None
+    return EMAIL_RE.match(email) is not None
 
 #Phone number validation function
 def is_valid_phone(phone):
-    pattern = r'^\+?1?\d{9,15}$'
-    return re.match(pattern, phone) is not None
+    return PHONE_RE.match(phone) is not None
+
+#Minimal {id, is_active, role} view of a user, cached so token checks skip the users table
+def get_user_summary(user_id):
+    key = f"user:{user_id}:mini"
+    summary = cache.get(key)
+    if summary is None:
+        user = db.session.get(User, int(user_id))
+        if not user:
+            return None
+        summary = {'id': user.id, 'is_active': user.is_active, 'role': user.role}
+        cache.set(key, summary, timeout=60)
+    return summary
+
+#Landlord property ids are versioned on the users row; a token's property_ids claim
+#is trusted only while its version matches, so adding/removing a property invalidates
+#it on every worker. The version is read once per request
+def property_ids_version(user_id):
+    versions = g.setdefault('properties_versions', {})
+    if user_id not in versions:
+        versions[user_id] = db.session.scalar(select(User.properties_version).where(User.id == int(user_id)))
+    return versions[user_id]
+
+#Call before committing the property insert/delete so both land in one transaction
+def invalidate_property_ids(user_id):
+    db.session.execute(update(User).where(User.id == int(user_id)).values(
+        properties_version=User.properties_version + 1,
+        updated_at=User.updated_at
+    ))
+    g.pop('properties_versions', None)
+
+def get_property_ids(user_id):
+    return db.session.scalars(select(Property.id).where(Property.landlord_id == int(user_id))).all()
+
+#Claims embedded in access tokens so per-request authorization skips the database
+def access_token_claims(user_id, role):
+    return {
+        'role': role,
+        'property_ids': get_property_ids(user_id),
+        'properties_version': property_ids_version(user_id)
+    }
+
+#Property ids of the current landlord, from the token when its claim is current
+def current_property_ids():
+    claims = get_jwt()
+    user_id = get_jwt_identity()
+    if 'property_ids' in claims and claims.get('properties_version') == property_ids_version(user_id):
+        return claims['property_ids']
+    return get_property_ids(user_id)
+
+#User for the current request, loaded once and kept on flask.g
+def current_user():
+    if 'current_user' not in g:
+        g.current_user = db.session.get(User, int(get_jwt_identity()), options=[selectinload(User.properties)])
+    return g.current_user
+
+#Role from the access token, so authorization-only checks skip the users table.
+#Tokens issued before the claim existed fall back to the database
+def current_role():
+    role = get_jwt().get('role')
+    if role is None:
+        user = current_user()
+        role = user.role if user else None
+    return role
 
 #Register route
 @auth_bp.route('/register', methods=['POST'])
 def register():
     try:
         #Register a new user(landlord)
-        data = request.get_json()
+        data = request.get_json() or {}
+
+        #Normalize input once
+        email = (data.get('email') or '').strip().lower()
+        password = data.get('password') or ''
+        first_name = (data.get('first_name') or '').strip()
+        last_name = (data.get('last_name') or '').strip()
+        phone = (data.get('phone') or '').strip()
+        role = (data.get('role') or '').strip() or 'landlord'
 
         #Validate required fields
-        required_fields = ['email', 'password', 'first_name', 'last_name']
-        for field in required_fields:
-            if field not in data or not data[field].strip():
+        for field, value in (('email', email), ('password', password.strip()),
+                             ('first_name', first_name), ('last_name', last_name)):
+            if not value:
                 return jsonify({'error': f'{field} is required'}), 400
 
         #Validate email format
-        if not is_valid_email(data['email']):
+        if not is_valid_email(email):
             return jsonify({'error':'Invalid email format'}), 400
         
         #Validate password strength
-        if len(data['password']) < 6:
+        if len(password) < 6:
             return jsonify({'error':'Password must be at least 6 characters long'}), 400
         
         #Validate phone number if provided
-        if 'phone' in data and data['phone'].strip():
-            if not is_valid_phone(data['phone']):
-                return jsonify({'error':'Invalid phone number format'}), 400
+        if phone and not is_valid_phone(phone):
+            return jsonify({'error':'Invalid phone number format'}), 400
             
         #Check if user already exists
-        existing_user =  User.query.filter_by(email=data['email']).first()
-        if existing_user:
+        email_taken = db.session.scalar(select(literal(1)).where(db.func.lower(User.email) == email).limit(1))
+        if email_taken:
             return jsonify({'error':'Email already registered'}), 400
         
         #Create new user
         new_user = User(
-            email = data['email'].lower().strip(),
-            first_name = data['first_name'].strip(),
-            last_name = data['last_name'].strip(),
-            role = data.get('role', 'landlord').strip() if data.get('role') else 'landlord',
+            email = email,
+            first_name = first_name,
+            last_name = last_name,
+            role = role,
             is_active = True
         )
 
         #set phone number if provided
-        if 'phone' in data and data['phone']:
-            new_user.phone = data['phone'].strip()  
+        if phone:
+            new_user.phone = phone
 
         #Set password & Hash
         new_user.set_password(data['password'])
@@ -71,7 +145,7 @@ def register():
         db.session.commit()
 
         #Create access & refresh tokens
-        access_token = create_access_token(identity=str(new_user.id))
+        access_token = create_access_token(identity=str(new_user.id), additional_claims=access_token_claims(new_user.id, new_user.role))
         refresh_token = create_refresh_token(identity=str(new_user.id))
 
         return jsonify({
@@ -96,7 +170,8 @@ def login():
             return jsonify({'error':'Email and password are required'}), 400
         
         #Find user by email
-        user = User.query.filter_by(email=data['email'].lower().strip()).first()
+        email = data['email'].strip().lower()
+        user = User.query.filter(db.func.lower(User.email) == email).first()
 
         #Check if user exists and active
         if not user or not user.is_active:
@@ -107,7 +182,7 @@ def login():
             return jsonify({'error':'Invalid credentials.Check your email or password  '}), 401
         
         #Create access & refresh tokens
-        access_token = create_access_token(identity=str(user.id))
+        access_token = create_access_token(identity=str(user.id), additional_claims=access_token_claims(user.id, user.role))
         refresh_token = create_refresh_token(identity=str(user.id))
 
         return jsonify({
@@ -122,11 +197,12 @@ def login():
 #Profile route
 @auth_bp.route('/profile', methods=['GET'])
 @jwt_required()
+@cache.cached(timeout=CACHE_TIMEOUT_NORMAL, make_cache_key=lambda: f"profile:{get_jwt_identity()}", response_filter=cache_successful)
 def get_profile():
     #Get current user profile
     try:
         user_id = get_jwt_identity()
-        user = User.query.get(user_id)
+        user = db.session.get(User, int(user_id))
         if not user:
             return jsonify({'error':'User not found'}), 404
         
@@ -142,44 +218,52 @@ def update_profile():
     #Update current user profile
     try:
         user_id = get_jwt_identity()
-        user = User.query.get(user_id)
+        user = db.session.get(User, int(user_id))
         if not user:
             return jsonify({'error':'User not found'}), 404
         
-        data = request.get_json()
+        data = request.get_json() or {}
+        email = (data.get('email') or '').strip().lower()
+        phone = (data.get('phone') or '').strip()
+        first_name = (data.get('first_name') or '').strip()
+        last_name = (data.get('last_name') or '').strip()
+        password = data.get('password') or ''
 
         #Validate email if provided
-        if 'email' in data and data['email'].strip():
-            new_email = data['email'].lower().strip()
-            if not is_valid_email(new_email):
+        if email:
+            if not is_valid_email(email):
                 return jsonify({'error':'Invalid email format'}), 400
             
-            existing = User.query.filter_by(email=data['email'].lower().strip()).first()
-            if existing and existing.id != user.id:
+            email_taken = db.session.scalar(
+                select(literal(1)).where(db.func.lower(User.email) == email, User.id != user.id).limit(1)
+            )
+            if email_taken:
                 return jsonify({'error':'Email already in use'}), 400
 
-            user.email = new_email 
+            user.email = email
         
         #Validate phone number if provided
-        if 'phone' in data and data['phone'].strip():
-            if not is_valid_phone(data['phone']):
+        if phone:
+            if not is_valid_phone(phone):
                 return jsonify({'error':'Invalid phone number format'}), 400
-            user.phone = data['phone'].strip()
+            user.phone = phone
         
         #Update other fields
-        if 'first_name' in data and data['first_name'].strip():
-            user.first_name = data['first_name'].strip()
-        if 'last_name' in data and data['last_name'].strip():
-            user.last_name = data['last_name'].strip()
+        if first_name:
+            user.first_name = first_name
+        if last_name:
+            user.last_name = last_name
         
         #Update password if provided
-        if 'password' in data and data['password'].strip():
-            if len(data['pasword']) < 6:
+        if password.strip():
+            if len(password) < 6:
                 return jsonify({'error':'Password must be at least 6 characters long'}), 400
-            user.set_password(data['password'])
+            user.set_password(password)
 
         
         db.session.commit()
+        cache.delete(f"profile:{user_id}")
+        cache.delete(f"user:{user_id}:mini")
 
         return jsonify({'message':'Profile updated successfully', 'user': user.to_dict()}), 200
     
@@ -194,11 +278,11 @@ def refresh_token():
     #Refresh access token using refresh token
     try:
         user_id = get_jwt_identity()
-        user = User.query.get(user_id)
-        if not user or not user.is_active:
+        user = get_user_summary(user_id)
+        if not user or not user['is_active']:
             return jsonify({'error':'User not found or inactive'}), 404
         
-        new_access_token = create_access_token(identity=str(user.id))
+        new_access_token = create_access_token(identity=str(user['id']), additional_claims=access_token_claims(user['id'], user['role']))
         return jsonify({'access_token': new_access_token}), 200
     
     except Exception as e:
@@ -211,6 +295,11 @@ def refresh_token():
 @jwt_required()
 def logout():
     try:
+        #Revoke this token until it expires
+        token = get_jwt()
+        ttl = max(int(token['exp'] - time.time()), 1)
+        cache.set(blocklist_key(token['jti']), True, timeout=ttl)
+
         return jsonify({'message':'Logout successful'}), 200
     
     except Exception as e:
@@ -1,38 +1,75 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from config import db
+from config import db, strict_loading_options
 from models import Invoice,Tenant,User,Apartment,Property,Payment
-from datetime import datetime
-from decimal import Decimal
-from sqlalchemy.exc import SQLAlchemyError
-import random
-import string
+from .auth import current_user, current_role
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from sqlalchemy import select, update, delete, tuple_, literal
+from sqlalchemy.exc import SQLAlchemyError, IntegrityError
+from sqlalchemy.orm import joinedload, aliased
+import secrets
+import re
 
 
 invoices_bp = Blueprint('invoices',__name__,url_prefix = '/api/invoices')
 
+MONTH_RE = re.compile(r'^\d{4}-(0[1-9]|1[0-2])$')
+#Rent falls due on the 10th, same as the SMS reminders assume
+RENT_DUE_DAY = 10
+#Invoice lists are paged by (created_at, id) cursor
+INVOICE_PAGE_SIZE = 100
+INVOICE_PAGE_MAX = 500
+
 #Generate invoice no helper function
 def generate_invoice_number():
-    prefix = 'INV'
-    random_str = ''.join(random.choices(string.ascii_uppercase + string.digits, k=6))
-    return f"{prefix}-{random_str}"
+    # 32 random bits from the OS CSPRNG
+    return f"INV-{secrets.token_hex(4).upper()}"
+
+#Money values go through str() so floats from JSON don't leak binary rounding into Decimal
+def to_decimal(value):
+    return value if isinstance(value, Decimal) else Decimal(str(value))
 
 def calculate_total_amount(rent_amount,late_fee=0,other_charges=0):
-    return float(rent_amount) + Decimal(late_fee) + Decimal(other_charges)\
+    return to_decimal(rent_amount) + to_decimal(late_fee) + to_decimal(other_charges)
 
-#Check whether landlord owns the apartment which tenant is renting
-def is_landlord_of_apartment(landlord_id,tenant_id):
-    tenant = Tenant.query.get(tenant_id)
+#Check whether landlord owns the apartment which tenant is renting.
+#Expects tenant.apartment.property to be loaded with the tenant (see OWNER_OPTIONS)
+def is_landlord_of_apartment(landlord_id,tenant):
     if not tenant or not tenant.apartment:
         return False
     return tenant.apartment.property.landlord_id == landlord_id
 
+#Ids of tenants in the landlord's properties, for folding ownership into a WHERE clause
+def landlord_tenant_ids(landlord_id):
+    return select(Tenant.id).join(
+        Apartment, Tenant.apartment_id == Apartment.id
+    ).join(
+        Property, Apartment.property_id == Property.id
+    ).where(Property.landlord_id == landlord_id)
+
+#Tenant -> apartment -> property chain read by is_landlord_of_apartment
+OWNER_OPTIONS = (joinedload(Tenant.apartment).joinedload(Apartment.property),)
+INVOICE_OWNER_OPTIONS = (joinedload(Invoice.tenant).joinedload(Tenant.apartment).joinedload(Apartment.property),)
+
+#Relationships read when serializing an invoice, loaded with the invoice itself
+INVOICE_LOAD_OPTIONS = (
+    joinedload(Invoice.tenant).joinedload(Tenant.user),
+    *INVOICE_OWNER_OPTIONS,
+    joinedload(Invoice.apartment).joinedload(Apartment.property),
+)
+
+#Aliases for the invoice list projection, independent of the ownership-filter joins
+ListTenant = aliased(Tenant)
+ListUser = aliased(User)
+ListApartment = aliased(Apartment)
+ListProperty = aliased(Property)
+
 #Create invoice 
 @invoices_bp.route('/invoices', methods=['POST'])
 @jwt_required()
 def create_invoice():
-    user_id = get_jwt_identity()
-    user = User.query.get(user_id)
+    user = current_user()
 
     data = request.get_json()
 
@@ -43,26 +80,28 @@ def create_invoice():
             return jsonify({'error': f'{field} is required'}), 400
 
     #check if tenant exists
-    tenant = Tenant.query.get(data['tenant_id'])
+    tenant = db.session.get(Tenant, data['tenant_id'], options=OWNER_OPTIONS)
     if not tenant:
         return jsonify({'error':'Tenant not found'}), 404
     
     #check auth(only landlord can create invoice for their tenant)
-    if user.role == 'landlord' and not is_landlord_of_apartment(user.id,tenant.id):
+    if user.role == 'landlord' and not is_landlord_of_apartment(user.id,tenant):
         return jsonify({'error':'Unauthorized to create invoice for this tenant'}), 403
     
-    #check if invoice for the month already exists
-    month_year = datetime.strptime(data['month_year'],'%Y-%m').strftime('%Y-%m')
-    existing_invoice = Invoice.query.filter_by(tenant_id=data['tenant_id'], month_year=month_year).first()
-    if existing_invoice:
-        return jsonify({'error':'Invoice for this month already exists'}), 400
+    month_year = str(data['month_year']).strip()
+    if not MONTH_RE.match(month_year):
+        return jsonify({'error':'month_year must be in YYYY-MM format'}), 400
     
     #Create Invoice 
     try:
-        rent_amount = float(data['rent_amount'])
-        late_fee = float(data.get('late_fee',0))
-        other_charges = float(data.get('other_charges',0))
+        rent_amount = to_decimal(data['rent_amount'])
+        late_fee = to_decimal(data.get('late_fee',0))
+        other_charges = to_decimal(data.get('other_charges',0))
         total_amount = calculate_total_amount(rent_amount,late_fee,other_charges)
+        if data.get('due_date'):
+            due_date = date.fromisoformat(data['due_date'])
+        else:
+            due_date = date.fromisoformat(f"{month_year}-{RENT_DUE_DAY:02d}")
 
         new_invoice = Invoice(
             tenant_id = data['tenant_id'],
@@ -72,7 +111,8 @@ def create_invoice():
             rent_amount = rent_amount,
             late_fee = late_fee,
             other_charges = other_charges,
-            total_amount = total_amount
+            total_amount = total_amount,
+            due_date = due_date
         )
         db.session.add(new_invoice)
         db.session.commit()
@@ -89,9 +129,20 @@ def create_invoice():
                 'total_amount': str(new_invoice.total_amount)
             }
         }),201  
-    except ValueError as e:
-       return jsonify({'error': 'Invalid data format:{str(e)}'}),400
+    except (ValueError, InvalidOperation) as e:
+       return jsonify({'error': f'Invalid data format:{str(e)}'}),400
     
+    except IntegrityError as e:
+        #uq_invoice_tenant_month rejects a second invoice for the month, so
+        #there is no pre-read on the happy path
+        db.session.rollback()
+        duplicate = db.session.scalar(select(literal(1)).where(
+            Invoice.tenant_id == data['tenant_id'], Invoice.month_year == month_year
+        ).limit(1))
+        if duplicate:
+            return jsonify({'error':'Invoice for this month already exists'}), 400
+        return jsonify({'error': f'Database error: {str(e)}'}), 500
+
     except SQLAlchemyError as e:
         db.session.rollback()
         return jsonify({'error': f'Database error: {str(e)}'}), 500
@@ -100,16 +151,17 @@ def create_invoice():
 @invoices_bp.route('/tenants/<int:tenant_id>/invoices', methods=['GET'])
 @jwt_required()
 def get_invoices_for_tenant(tenant_id):
-    user_id = get_jwt_identity()
-    user = User.query.get(user_id)
+    user = current_user()
 
  #query parameters for filtering 
     tenant_id = request.args.get('tenant_id', type=int)
     month_year = request.args.get('month_year')
     apartment_id = request.args.get('apartment_id', type=int)
-    status = request.args.get(status)
+    status = request.args.get('status')
     start_date = request.args.get('start_date')
     end_date = request.args.get('end_date')
+    after = request.args.get('after')
+    limit = max(1, min(request.args.get('limit', INVOICE_PAGE_SIZE, type=int), INVOICE_PAGE_MAX))
 
     #Base query
     if user.role == 'landlord':
@@ -134,45 +186,81 @@ def get_invoices_for_tenant(tenant_id):
     if status:
         query = query.filter(Invoice.status == status)
     if start_date:
-        query = query.filter(Invoice.created_at >= datetime.strptime(start_date, '%Y-%m-%d').date())
+        query = query.filter(Invoice.created_at >= date.fromisoformat(start_date))
     if end_date:    
-        query = query.filter(Invoice.created_at <=  datetime.strptime(end_date, '%Y-%m-%d').date())
+        query = query.filter(Invoice.created_at <=  date.fromisoformat(end_date))
     
-    #order by most recent
-    query = query.order_by(Invoice.created_at.desc())
-    invoices = query.all()
+    #cursor is "<created_at iso>,<id>" of the last invoice on the previous page
+    if after:
+        try:
+            after_created_at, after_id = after.split(',')
+            cursor = (datetime.fromisoformat(after_created_at), int(after_id))
+        except ValueError:
+            return jsonify({'error':'Invalid cursor'}), 400
+        query = query.filter(tuple_(Invoice.created_at, Invoice.id) < cursor)
+
+    #order by most recent, id breaks ties so pages never overlap
+    query = query.order_by(Invoice.created_at.desc(), Invoice.id.desc())
+
+    #Project only the columns in the response, so no Invoice objects are built
+    rows = query.outerjoin(
+        ListTenant, Invoice.tenant_id == ListTenant.id
+    ).outerjoin(
+        ListUser, ListTenant.user_id == ListUser.id
+    ).outerjoin(
+        ListApartment, Invoice.apartment_id == ListApartment.id
+    ).outerjoin(
+        ListProperty, ListApartment.property_id == ListProperty.id
+    ).with_entities(
+        Invoice.id, Invoice.tenant_id, Invoice.apartment_id, Invoice.invoice_number, Invoice.month_year,
+        Invoice.rent_amount, Invoice.late_fee, Invoice.other_charges, Invoice.total_amount,
+        Invoice.status, Invoice.due_date, Invoice.created_at,
+        ListUser.id.label('user_id'), ListUser.first_name, ListUser.last_name,
+        ListProperty.name.label('property_name'), ListApartment.apartment_number
+    ).limit(limit + 1).all()
+
+    #the extra row only tells us whether another page exists
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = f"{rows[-1].created_at.isoformat()},{rows[-1].id}"
 
     return jsonify({
-        'count':len(invoices),
+        'count':len(rows),
+        'next_cursor': next_cursor,
         'invoices':[{
-            'tenant_id': inv.tenant_id,
-            'apartment_id': inv.apartment_id,
-            'tenant_name':f"{inv.tenant.user.first_name} {inv.tenant.user.last_name}" if inv.tenant and inv.user else None,
-            'property_name': inv.apartment.property.name if inv.apartment and inv.apartment.property else None,
-            'apartment_number': inv.apartment.apartment_number if inv.apartment else None,
-            'invoice_number': inv.invoice_number,
-            'month_year': inv.month_year,
-            'rent_amount': float(inv.rent_amount),
-            'late_fee': float(inv.late_fee),
-            'other_charges': float(inv.other_charges),
-            'total_amount': float(inv.total_amount),
-            'status': inv.status,
-            'due_date': inv.due_date.strftime('%Y-%m-%d'),
-            'created_at': inv.created_at.isoformat() if created_at else None
-    }for inv in invoices]
+            'id': invoice_id,
+            'tenant_id': tenant_id,
+            'apartment_id': apartment_id,
+            'tenant_name':f"{first_name} {last_name}" if user_id is not None else None,
+            'property_name': property_name,
+            'apartment_number': apartment_number,
+            'invoice_number': invoice_number,
+            'month_year': month_year,
+            'rent_amount': rent_amount,
+            'late_fee': late_fee,
+            'other_charges': other_charges,
+            'total_amount': total_amount,
+            'status': status,
+            'due_date': due_date,
+            'created_at': created_at
+    }for (invoice_id, tenant_id, apartment_id, invoice_number, month_year,
+          rent_amount, late_fee, other_charges, total_amount, status, due_date, created_at,
+          user_id, first_name, last_name, property_name, apartment_number) in rows]
     })
 
 #get a single invoice by id
 @invoices_bp.route('/invoices/<int:invoice_id>', methods=['GET'])
 @jwt_required()
 def get_invoice(invoice_id):
-    user_id = get_jwt_identity()
-    user = User.query.get(user_id)
+    user = current_user()
 
-    invoice = Invoice.query.get(invoice_id)
+    invoice = db.session.get(Invoice, invoice_id, options=(*INVOICE_LOAD_OPTIONS, *strict_loading_options()))
+    if not invoice:
+        return jsonify({'error': 'Invoice not found'}), 404
 
     if user.role == "landlord":
-        if not is_landlord_of_apartment(user.id,invoice.tenant.id):
+        if not is_landlord_of_apartment(user.id,invoice.tenant):
             return jsonify({'error':'Unauthorized to view this invoice'}), 403
     elif user.role == 'tenant':
             tenant = Tenant.query.filter_by(user_id=user.id).first()
@@ -185,8 +273,8 @@ def get_invoice(invoice_id):
         payment_obj = Payment.query.get(invoice.payment_id)
         if payment_obj:
             payment = {
-                'payment_date': payment_obj.payment_date.isoformat(),
-                'amount': float(payment_obj.amount),
+                'payment_date': payment_obj.payment_date,
+                'amount': payment_obj.amount,
                 'mpesa_receipt_number': payment_obj.mpesa_receipt_number,
                 'payment_method': payment_obj.payment_method,
                 'month_paid_for': payment_obj.month_paid_for,
@@ -201,13 +289,13 @@ def get_invoice(invoice_id):
         'apartment_number': invoice.apartment.apartment_number if invoice.apartment else None,
         'invoice_number': invoice.invoice_number,
         'month_year': invoice.month_year,
-        'rent_amount': float(invoice.rent_amount),
-        'late_fee': float(invoice.late_fee),    
-        'other_charges': float(invoice.other_charges),
-        'total_amount': float(invoice.total_amount),
+        'rent_amount': invoice.rent_amount,
+        'late_fee': invoice.late_fee,    
+        'other_charges': invoice.other_charges,
+        'total_amount': invoice.total_amount,
         'status': invoice.status,
-        'due_date': invoice.due_date.strftime('%Y-%m-%d'),
-        'created_at': invoice.created_at.isoformat() if invoice.created_at else None,
+        'due_date': invoice.due_date,
+        'created_at': invoice.created_at,
         'payment': payment
     })  
 
@@ -217,15 +305,15 @@ def get_invoice(invoice_id):
 def update_invoice(invoice_id):
     """Update an existing invoice"""
     user_id = get_jwt_identity()
-    user = User.query.get(user_id)
+    role = current_role()
     
-    invoice = Invoice.query.get_or_404(invoice_id)
+    invoice = Invoice.query.options(*INVOICE_OWNER_OPTIONS).get_or_404(invoice_id)
     
     # Check authorization (only landlord or admin can update)
-    if user.role == 'landlord':
-        if not is_landlord_of_tenant(user_id, invoice.tenant_id):
+    if role == 'landlord':
+        if not is_landlord_of_apartment(int(user_id), invoice.tenant):
             return jsonify({'error': 'Unauthorized to update this invoice'}), 403
-    elif user.role == 'tenant':
+    elif role == 'tenant':
         return jsonify({'error': 'Tenants cannot update invoices'}), 403
     
     data = request.get_json()
@@ -233,18 +321,18 @@ def update_invoice(invoice_id):
     try:
         # Update fields if provided
         if 'rent_amount' in data:
-            invoice.rent_amount = float(data['rent_amount'])
+            invoice.rent_amount = to_decimal(data['rent_amount'])
         if 'late_fee' in data:
-            invoice.late_fee = float(data['late_fee'])
+            invoice.late_fee = to_decimal(data['late_fee'])
         if 'other_charges' in data:
-            invoice.other_charges = float(data['other_charges'])
+            invoice.other_charges = to_decimal(data['other_charges'])
         if 'due_date' in data:
-            invoice.due_date = datetime.strptime(data['due_date'], '%Y-%m-%d').date()
+            invoice.due_date = date.fromisoformat(data['due_date'])
         if 'status' in data:
             invoice.status = data['status']
         
         # Recalculate total
-        invoice.total_amount = calculate_total(
+        invoice.total_amount = calculate_total_amount(
             invoice.rent_amount, 
             invoice.late_fee, 
             invoice.other_charges
@@ -257,13 +345,13 @@ def update_invoice(invoice_id):
             'invoice': {
                 'id': invoice.id,
                 'invoice_number': invoice.invoice_number,
-                'total_amount': float(invoice.total_amount),
+                'total_amount': invoice.total_amount,
                 'status': invoice.status,
-                'due_date': invoice.due_date.strftime('%Y-%m-%d')
+                'due_date': invoice.due_date
             }
         })
         
-    except ValueError as e:
+    except (ValueError, InvalidOperation) as e:
         return jsonify({'error': f'Invalid data format: {str(e)}'}), 400
     except SQLAlchemyError as e:
         db.session.rollback()
@@ -275,13 +363,32 @@ def update_invoice(invoice_id):
 def delete_invoice(invoice_id):
     """Delete an invoice (only if not paid)"""
     user_id = get_jwt_identity()
-    user = User.query.get(user_id)
+    role = current_role()
+
+    # Single DELETE guarded by the same rules checked below
+    stmt = delete(Invoice).where(
+        Invoice.id == invoice_id,
+        Invoice.status != 'paid',
+        Invoice.payment_id.is_(None)
+    )
+    if role == 'landlord':
+        stmt = stmt.where(Invoice.tenant_id.in_(landlord_tenant_ids(int(user_id))))
     
-    invoice = Invoice.query.get_or_404(invoice_id)
+    try:
+        if db.session.execute(stmt).rowcount:
+            db.session.commit()
+            return jsonify({'message': 'Invoice deleted successfully'})
+        db.session.rollback()
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        return jsonify({'error': f'Database error: {str(e)}'}), 500
+
+    # Nothing deleted, find out why
+    invoice = Invoice.query.options(*INVOICE_OWNER_OPTIONS).get_or_404(invoice_id)
     
     # Check authorization (only landlord or admin can delete)
-    if user.role == 'landlord':
-        if not is_landlord_of_tenant(user_id, invoice.tenant_id):
+    if role == 'landlord':
+        if not is_landlord_of_apartment(int(user_id), invoice.tenant):
             return jsonify({'error': 'Unauthorized to delete this invoice'}), 403
     
     # Check if invoice is already paid
@@ -290,14 +397,8 @@ def delete_invoice(invoice_id):
     
     if invoice.payment_id:
         return jsonify({'error': 'Cannot delete invoice linked to a payment'}), 400
-    
-    try:
-        db.session.delete(invoice)
-        db.session.commit()
-        return jsonify({'message': 'Invoice deleted successfully'})
-    except SQLAlchemyError as e:
-        db.session.rollback()
-        return jsonify({'error': f'Database error: {str(e)}'}), 500
+
+    return jsonify({'error': 'Invoice changed while deleting, please retry'}), 409
 
 # mark invoice as paid
 @invoices_bp.route('/<int:invoice_id>/mark-paid', methods=['POST'])
@@ -305,42 +406,45 @@ def delete_invoice(invoice_id):
 def mark_invoice_paid(invoice_id):
     """Mark invoice as paid (when payment is received)"""
     user_id = get_jwt_identity()
-    user = User.query.get(user_id)
-    
-    invoice = Invoice.query.get_or_404(invoice_id)
-    
-    # Check authorization
-    if user.role == 'landlord':
-        if not is_landlord_of_tenant(user_id, invoice.tenant_id):
-            return jsonify({'error': 'Unauthorized'}), 403
-    
-    if invoice.status == 'paid':
-        return jsonify({'error': 'Invoice is already paid'}), 400
+    role = current_role()
     
-    data = request.get_json()
+    data = request.get_json() or {}
     payment_id = data.get('payment_id')
     
     if not payment_id:
         return jsonify({'error': 'payment_id is required'}), 400
     
-    payment = Payment.query.get(payment_id)
-    if not payment:
+    if db.session.query(Payment.id).filter_by(id=payment_id).scalar() is None:
         return jsonify({'error': 'Payment not found'}), 404
+
+    # Single UPDATE guarded by the same rules checked below
+    stmt = update(Invoice).where(
+        Invoice.id == invoice_id,
+        Invoice.status != 'paid'
+    ).values(status='paid', payment_id=payment_id)
+    if role == 'landlord':
+        stmt = stmt.where(Invoice.tenant_id.in_(landlord_tenant_ids(int(user_id))))
     
     try:
-        invoice.status = 'paid'
-        invoice.payment_id = payment_id
-        db.session.commit()
-        
-        return jsonify({
-            'message': 'Invoice marked as paid',
-            'invoice_id': invoice.id,
-            'payment_id': payment_id
-        })
+        if db.session.execute(stmt).rowcount:
+            db.session.commit()
+            return jsonify({
+                'message': 'Invoice marked as paid',
+                'invoice_id': invoice_id,
+                'payment_id': payment_id
+            })
+        db.session.rollback()
     except SQLAlchemyError as e:
         db.session.rollback()
         return jsonify({'error': f'Database error: {str(e)}'}), 500
 
-            
+    # Nothing updated, find out why
+    invoice = Invoice.query.options(*INVOICE_OWNER_OPTIONS).get_or_404(invoice_id)
+    
+    # Check authorization
+    if role == 'landlord':
+        if not is_landlord_of_apartment(int(user_id), invoice.tenant):
+            return jsonify({'error': 'Unauthorized'}), 403
+    
+    return jsonify({'error': 'Invoice is already paid'}), 400
 
-   
@@ -1,22 +1,159 @@
 from flask import Blueprint, request, jsonify
-from models import User,Tenant,Apartment,Property,Payment
+from models import Tenant,Apartment,Payment
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from config import db
+from sqlalchemy.orm import contains_eager, joinedload
+from config import app, db, cache, strict_loading_options
+from .auth import current_role, current_property_ids
 from sms_client import sms_client
-from datetime import datetime,date
+from datetime import date
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 import logging
+import os
+import threading
+import uuid
 
 notifications_bp = Blueprint('notifications',__name__,url_prefix='/api/notifications')
 logger = logging.getLogger(__name__)
 
+#Load each tenant's apartment and property with the tenants themselves, on
+#queries that already join Apartment
+JOINED_HOUSE_OPTIONS = (contains_eager(Tenant.apartment).joinedload(Apartment.property),)
+
+def get_apartment_house_name(apartment):
+    return f"{apartment.property.name} - {apartment.apartment_number}"
+
+def get_house_name(tenant):
+    return get_apartment_house_name(tenant.apartment)
+
+#Fetch an apartment together with its property for SMS house names
+def get_apartment_with_property(apartment_id):
+    return db.session.get(Apartment, apartment_id, options=(joinedload(Apartment.property),))
+
+#Upper bound on concurrent SMS API calls per request
+SMS_MAX_WORKERS = 16
+
+#Call send(job) for every job concurrently, returning results in job order.
+#Jobs carry plain values so worker threads never touch the ORM session
+def dispatch_sms(send, jobs):
+    if not jobs:
+        return []
+    with ThreadPoolExecutor(max_workers=min(SMS_MAX_WORKERS, len(jobs))) as executor:
+        return list(executor.map(send, jobs))
+
+#Per-tenant entry in an SMS results list
+def sms_result(tenant_id, phone_number, result):
+    return {
+        'tenant_id': tenant_id,
+        'phone_number': phone_number,
+        'status': 'sent' if result and result.get('status') == 'success' else 'failed',
+        'error': result.get('error') if result else None
+    }
+
+#Background SMS jobs: large sends return a job id straight away and run on a
+#per-process executor. Job state lives in the cache: with REDIS_URL set any
+#worker can report it, without Redis only the worker that queued the job can
+SMS_JOB_WORKERS = 4
+SMS_JOB_TIMEOUT = 24 * 60 * 60
+_sms_job_executor = None
+_sms_job_executor_pid = None
+_sms_job_executor_lock = threading.Lock()
+
+#Created on first use in each worker process, so it is built after gevent has
+#patched threading and a forked worker never inherits its parent's pool
+def get_sms_job_executor():
+    global _sms_job_executor, _sms_job_executor_pid
+    with _sms_job_executor_lock:
+        if _sms_job_executor is None or _sms_job_executor_pid != os.getpid():
+            _sms_job_executor = ThreadPoolExecutor(max_workers=SMS_JOB_WORKERS, thread_name_prefix='sms-job')
+            _sms_job_executor_pid = os.getpid()
+    return _sms_job_executor
+
+def sms_job_key(job_id):
+    return f"sms:job:{job_id}"
+
+def run_sms_job(job_id, owner_id, send_all, jobs):
+    with app.app_context():
+        try:
+            sms_results = send_all(jobs)
+            results = [sms_result(job['tenant_id'], job['phone_number'], result) for job, result in zip(jobs, sms_results)]
+            cache.set(sms_job_key(job_id), {
+                'owner_id': owner_id,
+                'status': 'completed',
+                'total': len(jobs),
+                'sent': sum(1 for result in results if result['status'] == 'sent'),
+                'results': results
+            }, timeout=SMS_JOB_TIMEOUT)
+        except Exception as e:
+            logger.error("SMS job %s failed: %s", job_id, e)
+            cache.set(sms_job_key(job_id), {
+                'owner_id': owner_id,
+                'status': 'failed',
+                'total': len(jobs),
+                'error': str(e)
+            }, timeout=SMS_JOB_TIMEOUT)
+
+#Queue send_all(jobs) and return the job id to poll at /jobs/<job_id>. send_all
+#returns one result per job; jobs must carry tenant_id and phone_number
+def enqueue_sms_job(send_all, jobs):
+    job_id = uuid.uuid4().hex
+    owner_id = get_jwt_identity()
+    cache.set(sms_job_key(job_id), {'owner_id': owner_id, 'status': 'queued', 'total': len(jobs)}, timeout=SMS_JOB_TIMEOUT)
+    get_sms_job_executor().submit(run_sms_job, job_id, owner_id, send_all, jobs)
+    return job_id
+
+def send_overdue_job(job):
+    kwargs = dict(job)
+    del kwargs['tenant_id']
+    return sms_client.send_overdue_notice(**kwargs)
+
+def send_overdue_jobs(jobs):
+    return dispatch_sms(send_overdue_job, jobs)
+
+#Keyword arguments for sms_client.send_overdue_notice, plus tenant_id
+def overdue_job(tenant, days_overdue):
+    return {
+        'tenant_name': tenant.name,
+        'amount': float(tenant.monthly_rent),
+        'house_name': get_house_name(tenant),
+        'days_overdue': days_overdue,
+        'phone_number': tenant.phone,
+        'tenant_id': tenant.id
+    }
+
+#Keyword arguments for sms_client.send_payment_reminder
+def reminder_job(tenant, due_date):
+    return {
+        'tenant_name': tenant.name,
+        'amount': float(tenant.monthly_rent),
+        'house_name': get_house_name(tenant),
+        'due_date': due_date,
+        'phone_number': tenant.phone,
+        'tenant_id': tenant.id
+    }
+
+#Reminder due date as it reads in the SMS, e.g. "October 10, 2026"
+@lru_cache(maxsize=64)
+def format_due_date(year, month, day=10):
+    return date(year, month, day).strftime('%B %d, %Y')
+
+#Ids of the given tenants with a completed payment for month_year, in one query
+def get_paid_tenant_ids(tenants, month_year):
+    tenant_ids = [tenant.id for tenant in tenants]
+    if not tenant_ids:
+        return set()
+    rows = db.session.query(Payment.tenant_id).filter(
+        Payment.tenant_id.in_(tenant_ids),
+        Payment.month_paid_for == month_year,
+        Payment.status == 'completed'
+    ).distinct()
+    return {row.tenant_id for row in rows}
+
 @notifications_bp.route('/send/sms',methods=['POST'])
 @jwt_required()
 def send_custom_sms():
     try:
-        user_id = get_jwt_identity()
-        user = User.query.get(user_id)
-
-        if not user or user.role != 'landlord':
+        if current_role() != 'landlord':
             return jsonify({'message':'Unauthorized only landlords can send notifications'}),403
         
         data = request.get_json()
@@ -28,31 +165,38 @@ def send_custom_sms():
         
         if not tenant_ids:
             return jsonify({'message':'At least one tenant ID is required'}),400
-        
-        #Get tenants and verify they belong to the landlord's properties
-        tenants = Tenant.query.filter(Tenant.id.in_(tenant_ids)).all()
-
-        #verify ownership
-        landlord_property_ids = [property.id for property in user.properties]
-        results  = []
-
-        for tenant in tenants:
-            apartment = Apartment.query.get(tenant.apartment_id)
-            if apartment and apartment.property_id in landlord_property_ids:
-                result = sms_client.send_custom_message(
-                    tenant.phone,
-                    message
-                )
-                results.append({
-                    'tenant_id': tenant.id,
-                    'phone_number': tenant.phone,
-                    'status':'sent' if result['success'] else 'failed',
-                    'error': result.get('error')
-                })
-            else:
+
+        #Ids are compared with Tenant.id below, so they must be ints ("5" would
+        #match in SQL but not in the ownership check)
+        try:
+            if not isinstance(tenant_ids, list):
+                raise TypeError
+            tenant_ids = [int(tenant_id) for tenant_id in tenant_ids]
+        except (TypeError, ValueError):
+            return jsonify({'message':'tenant_ids must be a list of integers'}),400
+        
+        #Get only the requested tenants that belong to the landlord's properties
+        landlord_property_ids = current_property_ids()
+        tenants = db.session.query(Tenant).join(
+            Apartment, Tenant.apartment_id == Apartment.id
+        ).options(*strict_loading_options()).filter(
+            Apartment.property_id.in_(landlord_property_ids),
+            Tenant.id.in_(tenant_ids)
+        ).all()
+
+        sms_results = dispatch_sms(
+            lambda phone: sms_client.send_custom_message(phone, message),
+            [tenant.phone for tenant in tenants]
+        )
+        results = [sms_result(tenant.id, tenant.phone, result) for tenant, result in zip(tenants, sms_results)]
+
+        #Requested ids the landlord doesn't own
+        owned_ids = {tenant.id for tenant in tenants}
+        for tenant_id in tenant_ids:
+            if tenant_id not in owned_ids:
                 results.append({
-                    'tenant_id': tenant.id,
-                    'phone_number': tenant.phone,
+                    'tenant_id': tenant_id,
+                    'phone_number': None,
                     'status':'failed',
                     'error':'Tenant does not belong to your property'
                 })
@@ -61,17 +205,14 @@ def send_custom_sms():
             'results':results
         }), 200
     except Exception as e:
-        logger.error(f"Custom SMS error:{str(e)}")
+        logger.error("Custom SMS error: %s", e)
         return jsonify({'error':str(e)}),500
     
 @notifications_bp.route('/sms/payment-reminder', methods=['POST'])  
 @jwt_required()
 def send_payment_reminder():
     try:
-        user_id = get_jwt_identity()
-        user = User.query.get(user_id)
-
-        if not user or user.role != 'landlord':
+        if current_role() != 'landlord':
             return jsonify({'message': 'Unauthorized only landlords can send notifications'}), 403
         
         data = request.get_json()
@@ -82,16 +223,15 @@ def send_payment_reminder():
             return jsonify({'message': 'At least one tenant ID is required'}), 400
         
         if not due_date:
-            today = date.today()
-            due_date = date(today.year, today.month, 10).strftime('%Y-%m-%d')
+            due_date = date.today().replace(day=10).isoformat()
 
         # Get landlord's property IDs
-        landlord_property_ids = [property.id for property in user.properties]
+        landlord_property_ids = current_property_ids()
         
         # Get tenants that match requested IDs AND belong to landlord's properties
         tenants = db.session.query(Tenant).join(
             Apartment, Tenant.apartment_id == Apartment.id
-        ).filter(
+        ).options(*JOINED_HOUSE_OPTIONS, *strict_loading_options()).filter(
             Apartment.property_id.in_(landlord_property_ids),
             Tenant.id.in_(tenant_ids),
             Tenant.status == 'active'
@@ -105,30 +245,16 @@ def send_payment_reminder():
                 'your_property_ids': landlord_property_ids
             }), 404
 
-        results = []
-
-        for tenant in tenants:
-            apartment = Apartment.query.get(tenant.apartment_id)
-            property_info = Property.query.get(apartment.property_id)
-            house_name = f"{property_info.name} - {apartment.apartment_number}"
-
-            result = sms_client.send_payment_reminder(
-                tenant_name=tenant.name,
-                amount=float(tenant.monthly_rent),
-                house_name=house_name,
-                due_date=due_date,
-                phone_number=tenant.phone,
-                tenant_id=tenant.id
-            )
-
-            results.append({
-                'tenant_id': tenant.id,
-                'tenant_name': tenant.name,
-                'phone': tenant.phone,
-                'status':'sent' if result.get('status') == 'success' else 'failed',
-                'error': result.get('error'),
-                'details': result.get('details')
-            })
+        #Sent in one batch; the settings page waits for the per-tenant results
+        sms_results = sms_client.send_payment_reminders([reminder_job(tenant, due_date) for tenant in tenants])
+        results = [{
+            'tenant_id': tenant.id,
+            'tenant_name': tenant.name,
+            'phone': tenant.phone,
+            'status':'sent' if result.get('status') == 'success' else 'failed',
+            'error': result.get('error'),
+            'details': result.get('details')
+        } for tenant, result in zip(tenants, sms_results)]
 
         return jsonify({
             'message': 'Payment reminders sent',
@@ -136,7 +262,7 @@ def send_payment_reminder():
         }), 200
         
     except Exception as e:
-        logger.error(f"Payment reminder error: {str(e)}")
+        logger.error("Payment reminder error: %s", e)
         import traceback
         logger.error(traceback.format_exc())
         return jsonify({'error': str(e)}), 500
@@ -145,10 +271,7 @@ def send_payment_reminder():
 @jwt_required()
 def send_overdue_notice():
     try:
-        user_id = get_jwt_identity()
-        user = User.query.get(user_id)
-
-        if not user or user.role != 'landlord':
+        if current_role() != 'landlord':
             return jsonify({'message':'Unauthorized only landlords can send notifications'}),403
         
         data = request.get_json()
@@ -158,187 +281,130 @@ def send_overdue_notice():
             return jsonify({'message':'At least one tenant ID is required'}),400
         
         #Get all landlord properties
-        landlord_property_ids = [property.id for property in user.properties]
+        landlord_property_ids = current_property_ids()
 
         #Get all active tenants in landlord's properties
         tenants = db.session.query(Tenant).join(
             Apartment,Tenant.apartment_id == Apartment.id
-        ).filter(
+        ).options(*JOINED_HOUSE_OPTIONS, *strict_loading_options()).filter(
             Apartment.property_id.in_(landlord_property_ids),
             Tenant.status == 'active'
         ).all()
 
         results = []
-        current_month = datetime.now().strftime('%Y-%m')
-
-        for tenant in tenants:
-            #Check if tenant has paid for the current month
-            payment = Payment.query.filter_by(
-                tenant_id = tenant.id,
-                month_paid_for = current_month,
-                status = 'completed'
-            ).first()
-
-            if not payment:
-                #Calculate due date assume rent is due on 10th of each month
-                today = date.today()
-                due_date = date(today.year,today.month,10)
-
-                if today > due_date:
-                    days_overdue  = (today - due_date).days
-                    apartment = Apartment.query.get(tenant.apartment_id)
-                    property_info = Property.query.get(apartment.property_id)
-                    house_name = f"{property_info.name} - {apartment.apartment_number}"
-
-                    result = sms_client.send_overdue_notice(
-                        tenant_name = tenant.name,
-                        amount= float(tenant.monthly_rent),
-                        house_name = house_name,
-                        days_overdue = days_overdue,
-                        phone_number = tenant.phone
-                    )
-                    results.append({
-                        'tenant_id':tenant.id,
-                        'phone_number':tenant.phone,
-                        'status':'sent' if result.get('status') == 'success' else 'failed',
-                        'error': result.get('error')
-                    })
+        #Calculate due date once, assume rent is due on 10th of each month
+        today = date.today()
+        current_month = today.strftime('%Y-%m')
+        due_date = today.replace(day=10)
+        days_overdue = (today - due_date).days
+
+        if days_overdue > 0:
+            paid_tenant_ids = get_paid_tenant_ids(tenants, current_month)
+
+            #Tenants who haven't paid for the current month, notified concurrently
+            jobs = [overdue_job(tenant, days_overdue) for tenant in tenants if tenant.id not in paid_tenant_ids]
+            sms_results = dispatch_sms(send_overdue_job, jobs)
+            results = [sms_result(job['tenant_id'], job['phone_number'], result) for job, result in zip(jobs, sms_results)]
         return jsonify({
             'message':'Overdue notices sent',
             'results':results
         }), 200
     except Exception as e:
-        logger.error(f"Overdue notice error:{str(e)}")
+        logger.error("Overdue notice error: %s", e)
         return jsonify({'error':str(e)}), 500
     
 @notifications_bp.route('/sms/bulk-reminder', methods=['POST'])
 @jwt_required()
 def send_bulk_reminder():
     try:
-        user_id = get_jwt_identity()
-        user = User.query.get(user_id)
-
-        if not user or user.role != 'landlord':
+        if current_role() != 'landlord':
             return jsonify({'message': 'Unauthorized only landlords can send notifications'}), 403
         
         data = request.get_json()
         property_id = data.get('property_id')  
-        due_date = data.get('due_date', date(date.today().year, date.today().month, 10).strftime('%Y-%m-%d'))
+        due_date = data.get('due_date') or date.today().replace(day=10).isoformat()
 
         # Get tenants
-        tenants = []  
-        
+        landlord_property_ids = current_property_ids()
         if property_id:
             # verify ownership
-            property_info = Property.query.get(property_id)
-            if not property_info or property_info.landlord_id != user.id:
+            if int(property_id) not in landlord_property_ids:
                 return jsonify({'message': 'You do not own this property'}), 403
-            
-            apartment_ids = [apartment.id for apartment in property_info.apartments]
-            tenants = Tenant.query.filter(
-                Tenant.apartment_id.in_(apartment_ids),
-                Tenant.status == 'active'
-            ).all()
+            property_ids = [int(property_id)]
         else:
             # All landlords tenants
-            landlord_property_ids = [property.id for property in user.properties]
-            tenants = db.session.query(Tenant).join(
-                Apartment, Tenant.apartment_id == Apartment.id
-            ).filter(
-                Apartment.property_id.in_(landlord_property_ids),
-                Tenant.status == 'active'
-            ).all()
+            property_ids = landlord_property_ids
+
+        tenants = db.session.query(Tenant).join(
+            Apartment, Tenant.apartment_id == Apartment.id
+        ).options(*JOINED_HOUSE_OPTIONS, *strict_loading_options()).filter(
+            Apartment.property_id.in_(property_ids),
+            Tenant.status == 'active'
+        ).all()
 
         # Check if any tenants found
         if not tenants:
             return jsonify({'message': 'No active tenants found'}), 404
 
-        results = []
-        for tenant in tenants:
-            apartment = Apartment.query.get(tenant.apartment_id)
-            property_info = Property.query.get(apartment.property_id)
-            house_name = f"{property_info.name} - {apartment.apartment_number}"
-
-            result = sms_client.send_payment_reminder(
-                tenant_name=tenant.name,
-                amount=float(tenant.monthly_rent),
-                house_name=house_name,
-                due_date=due_date,
-                phone_number=tenant.phone,
-                tenant_id=tenant.id
-            )
-            results.append({
-                'tenant_id': tenant.id,
-                'phone_number': tenant.phone,
-                'status': 'sent' if result.get('success') else 'failed',
-                'error': result.get('error')
-            })
+        job_id = enqueue_sms_job(sms_client.send_payment_reminders, [reminder_job(tenant, due_date) for tenant in tenants])
         
         return jsonify({
-            'message': 'Bulk payment reminders sent',
-            'results': results
-        }), 200
+            'message': 'Bulk payment reminders queued',
+            'job_id': job_id,
+            'total_tenants': len(tenants)
+        }), 202
         
     except Exception as e:
-        logger.error(f"Bulk reminder error: {str(e)}")
+        logger.error("Bulk reminder error: %s", e)
         return jsonify({'error': str(e)}), 500
 
 def send_payment_confirmation_sms(payment):
     """
     Automatically send payment confirmation SMS
-    Called after successful payment
+    Called after successful payment; the SMS is queued, not sent inline
     """
     try:
-        tenant = Tenant.query.get(payment.tenant_id)
+        tenant = db.session.get(Tenant, payment.tenant_id)
         if not tenant:
             return
         
-        apartment = Apartment.query.get(payment.apartment_id)
-        property_info = Property.query.get(apartment.property_id)
-        house_name = f"{property_info.name} - {apartment.apartment_number}"
+        house_name = get_apartment_house_name(get_apartment_with_property(payment.apartment_id))
         
-        result = sms_client.send_payment_confirmation(
+        sms_client.queue_sms(tenant.phone, sms_client.payment_confirmation_message(
             tenant_name=tenant.name,
             amount=float(payment.amount),
             house_name=house_name,
-            mpesa_ref=payment.mpesa_receipt_number,
-            phone_number=tenant.phone
-        )
-        
-        logger.info(f"Payment confirmation SMS sent to {tenant.name}: {result}")
-        return result
+            mpesa_ref=payment.mpesa_receipt_number
+        ))
+        logger.info("Payment confirmation SMS queued for %s", tenant.name)
         
     except Exception as e:
-        logger.error(f"Auto confirmation SMS error: {str(e)}")
+        logger.error("Auto confirmation SMS error: %s", e)
         return None
 
 
-def send_partial_payment_sms(payment, tenant, apartment):
+def send_partial_payment_sms(payment, tenant):
     """
-    Send partial payment notification
+    Send partial payment notification; the SMS is queued, not sent inline
     """
     try:
-        property_info = Property.query.get(apartment.property_id)
-        house_name = f"{property_info.name} - {apartment.apartment_number}"
+        house_name = get_apartment_house_name(get_apartment_with_property(payment.apartment_id))
         
         expected_rent = float(tenant.monthly_rent)
         amount_paid = float(payment.amount)
         balance = expected_rent - amount_paid
         
-        result = sms_client.send_partial_payment_notice(
+        sms_client.queue_sms(tenant.phone, sms_client.partial_payment_message(
             tenant_name=tenant.name,
             amount_paid=amount_paid,
             amount_due=expected_rent,
             balance=balance,
-            house_name=house_name,
-            phone_number=tenant.phone
-        )
-        
-        logger.info(f"Partial payment SMS sent to {tenant.name}")
-        return result
+            house_name=house_name
+        ))
+        logger.info("Partial payment SMS queued for %s", tenant.name)
         
     except Exception as e:
-        logger.error(f"Partial payment SMS error: {str(e)}")
+        logger.error("Partial payment SMS error: %s", e)
         return None
 
 
@@ -352,51 +418,32 @@ def trigger_monthly_reminders():
     Usually run on 1st of each month
     """
     try:
-        current_user_id = get_jwt_identity()
-        user = User.query.get(current_user_id)
-        
-        if not user or user.role != 'landlord':
+        if current_role() != 'landlord':
             return jsonify({'error': 'Unauthorized'}), 403
         
         # Get all active tenants
-        landlord_property_ids = [prop.id for prop in user.properties]
+        landlord_property_ids = current_property_ids()
         tenants = db.session.query(Tenant).join(
             Apartment, Tenant.apartment_id == Apartment.id
-        ).filter(
+        ).options(*JOINED_HOUSE_OPTIONS, *strict_loading_options()).filter(
             Apartment.property_id.in_(landlord_property_ids),
             Tenant.status == 'active'
         ).all()
         
-        # Due date is 5th of current month
+        # Due date is 10th of current month
         today = date.today()
-        due_date = date(today.year, today.month, 10).strftime('%B 10, %Y')
+        due_date = format_due_date(today.year, today.month)
         
-        sent_count = 0
-        for tenant in tenants:
-            apartment = Apartment.query.get(tenant.apartment_id)
-            property_info = Property.query.get(apartment.property_id)
-            house_name = f"{property_info.name} - {apartment.apartment_number}"
-            
-            result = sms_client.send_payment_reminder(
-                tenant_name=tenant.name,
-                amount=float(tenant.monthly_rent),
-                house_name=house_name,
-                due_date=due_date,
-                phone_number=tenant.phone,
-                tenant_id=tenant.id
-            )
-            
-            if result and result.get('status') == 'success':
-                sent_count += 1
+        job_id = enqueue_sms_job(sms_client.send_payment_reminders, [reminder_job(tenant, due_date) for tenant in tenants])
         
         return jsonify({
-            'message': 'Monthly reminders sent',
-            'total_tenants': len(tenants),
-            'sent': sent_count
-        }), 200
+            'message': 'Monthly reminders queued',
+            'job_id': job_id,
+            'total_tenants': len(tenants)
+        }), 202
         
     except Exception as e:
-        logger.error(f"Monthly reminders error: {str(e)}")
+        logger.error("Monthly reminders error: %s", e)
         return jsonify({'error': str(e)}), 500
 
 
@@ -408,58 +455,55 @@ def check_and_notify_overdue():
     Can be run daily by a cron job
     """
     try:
-        current_user_id = get_jwt_identity()
-        user = User.query.get(current_user_id)
-        
-        if not user or user.role != 'landlord':
+        if current_role() != 'landlord':
             return jsonify({'error': 'Unauthorized'}), 403
         
-        landlord_property_ids = [prop.id for prop in user.properties]
+        landlord_property_ids = current_property_ids()
         tenants = db.session.query(Tenant).join(
             Apartment, Tenant.apartment_id == Apartment.id
-        ).filter(
+        ).options(*JOINED_HOUSE_OPTIONS, *strict_loading_options()).filter(
             Apartment.property_id.in_(landlord_property_ids),
             Tenant.status == 'active'
         ).all()
         
-        current_month = datetime.now().strftime('%Y-%m')
         today = date.today()
-        due_date = date(today.year, today.month, 10)
+        current_month = today.strftime('%Y-%m')
+        days_overdue = (today - today.replace(day=10)).days
         
-        overdue_count = 0
-        if today > due_date:
-            for tenant in tenants:
-                # Check if paid
-                payment = Payment.query.filter_by(
-                    tenant_id=tenant.id,
-                    month_paid_for=current_month,
-                    status='completed'
-                ).first()
-                
-                if not payment:
-                    days_overdue = (today - due_date).days
-                    
-                    # Send notice on days 3, 7, 14, 21, 28
-                    if days_overdue in [3, 7, 14, 21, 28]:
-                        apartment = Apartment.query.get(tenant.apartment_id)
-                        property_info = Property.query.get(apartment.property_id)
-                        house_name = f"{property_info.name} - {apartment.apartment_number}"
-                        
-                        sms_client.send_overdue_notice(
-                            tenant_name=tenant.name,
-                            amount=float(tenant.monthly_rent),
-                            house_name=house_name,
-                            days_overdue=days_overdue,
-                            phone_number=tenant.phone
-                        )
-                        overdue_count += 1
+        # Send notice on days 3, 7, 14, 21, 28
+        if days_overdue not in (3, 7, 14, 21, 28):
+            return jsonify({
+                'message': 'Overdue check completed',
+                'job_id': None,
+                'notices_queued': 0
+            }), 200
+
+        # Skip tenants who have paid
+        paid_tenant_ids = get_paid_tenant_ids(tenants, current_month)
+        jobs = [overdue_job(tenant, days_overdue) for tenant in tenants if tenant.id not in paid_tenant_ids]
+        job_id = enqueue_sms_job(send_overdue_jobs, jobs)
         
         return jsonify({
             'message': 'Overdue check completed',
-            'notices_sent': overdue_count
-        }), 200
+            'job_id': job_id,
+            'notices_queued': len(jobs)
+        }), 202
         
     except Exception as e:
-        logger.error(f"Check overdue error: {str(e)}")
+        logger.error("Check overdue error: %s", e)
         return jsonify({'error': str(e)}), 500
 
+
+@notifications_bp.route('/jobs/<job_id>', methods=['GET'])
+@jwt_required()
+def get_sms_job(job_id):
+    """
+    Status of a queued SMS job, with per-tenant results once it completes
+    """
+    job = cache.get(sms_job_key(job_id))
+    if not job or job['owner_id'] != get_jwt_identity():
+        return jsonify({'error': 'Job not found'}), 404
+
+    job.pop('owner_id')
+    return jsonify({'job_id': job_id, **job}), 200
+
@@ -1,19 +1,63 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from models import User, Payment, Tenant, Apartment, Property
-from config import db
+from models import User, Payment, Tenant, Apartment, Property, PAYMENT_STATUSES
+from config import db, cache, strict_loading_options
+from sqlalchemy import select, func, case, tuple_
+from sqlalchemy.orm import contains_eager
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from datetime import datetime
+from decimal import Decimal
+from schema import Schema, And, Use, Optional, SchemaError
 from mpesa_client import mpesa_client
 import logging
 from .notifications import send_payment_confirmation_sms,send_partial_payment_sms
+from .apartments import get_apartment_id_by_number
+from .auth import current_role, current_property_ids
 
 payments_bp = Blueprint('payments', __name__, url_prefix='/api/payments')
 
-# Set up logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+# Processed M-Pesa receipts are remembered for a day so retried callbacks skip the database
+RECEIPT_CACHE_TIMEOUT = 24 * 60 * 60
+
+def receipt_cache_key(mpesa_receipt):
+    return f"mpesa:receipt:{mpesa_receipt}"
+
+# INSERT ... ON CONFLICT for the databases we run on
+DIALECT_INSERTS = {
+    'postgresql': postgresql_insert,
+    'sqlite': sqlite_insert,
+}
+
+# M-Pesa C2B callback body, checked and coerced in a single validate() call
+def parse_trans_time(trans_time):
+    try:
+        return datetime.strptime(trans_time, '%Y%m%d%H%M%S')
+    except ValueError:
+        logger.error("Invalid time format: %s", trans_time)
+        return datetime.utcnow()
+
+REQUIRED_TEXT = And(lambda value: value is not None, Use(str), Use(str.strip), len, error='Missing required fields')
+MPESA_CALLBACK_SCHEMA = Schema({
+    'TransID': REQUIRED_TEXT,
+    'BillRefNumber': REQUIRED_TEXT,
+    'TransAmount': And(Use(lambda amount: Decimal(str(amount))), lambda amount: amount.is_finite() and amount > 0,
+                       error='Invalid amount format'),
+    'MSISDN': REQUIRED_TEXT,
+    'TransTime': And(REQUIRED_TEXT, Use(parse_trans_time)),
+    Optional('FirstName', default=''): Use(str),
+    Optional('MiddleName', default=''): Use(str),
+    Optional('LastName', default=''): Use(str),
+}, ignore_extra_keys=True)
+
+# Page sizes for the landlord payment list when paging is requested
+PAYMENTS_PAGE_SIZE = 50
+PAYMENTS_PAGE_MAX = 200
+
+
 # ==================== M-PESA ROUTES ====================
 
 @payments_bp.route('/mpesa/callback', methods=['POST'])
@@ -23,57 +67,43 @@ def mpesa_callback():
     Called when tenant pays via Paybill 174379
     """
     try:
-        data = request.get_json()
-        logger.info(f"M-Pesa C2B callback received: {data}")
-
-        # Extract M-Pesa data
-        mpesa_receipt = data.get('TransID')
-        apartment_number = data.get('BillRefNumber')
-        amount = data.get('TransAmount')
-        phone_number = data.get('MSISDN')
-        trans_time = data.get('TransTime')
+        data = request.get_json(silent=True)
+        logger.info("M-Pesa C2B callback received: %s", data)
 
-        # Validate required fields
-        if not all([mpesa_receipt, apartment_number, amount, phone_number, trans_time]):
-            return jsonify({
-                'ResultCode': 1,
-                'ResultDesc': 'Missing required fields'
-            }), 400
-
-        # Convert amount
+        # Validate and extract M-Pesa data
         try:
-            amount = float(amount)
-        except (ValueError, TypeError):
+            data = MPESA_CALLBACK_SCHEMA.validate(data)
+        except SchemaError as e:
             return jsonify({
                 'ResultCode': 1,
-                'ResultDesc': 'Invalid amount format'
+                'ResultDesc': e.code
             }), 400
 
-        # Check for duplicate
-        existing_payment = Payment.query.filter_by(
-            mpesa_receipt_number=mpesa_receipt
-        ).first()
-
-        if existing_payment:
-            logger.warning(f"Duplicate transaction: {mpesa_receipt}")
+        mpesa_receipt = data['TransID']
+        apartment_number = data['BillRefNumber']
+        amount = data['TransAmount']
+        phone_number = data['MSISDN']
+        payment_date = data['TransTime']
+
+        # Check for duplicate: M-Pesa retries are answered from the cache when
+        # possible, the database stays the source of truth on a miss
+        receipt_key = receipt_cache_key(mpesa_receipt)
+        if cache.get(receipt_key):
+            logger.warning("Duplicate transaction: %s", mpesa_receipt)
             return jsonify({
                 'ResultCode': 0,
                 'ResultDesc': 'Transaction already processed'
             }), 200
 
+
         # Parse tenant name
-        first_name = data.get('FirstName', '')
-        middle_name = data.get('MiddleName', '')
-        last_name = data.get('LastName', '')
-        tenant_name = f"{first_name} {middle_name} {last_name}".strip()
+        tenant_name = f"{data['FirstName']} {data['MiddleName']} {data['LastName']}".strip()
 
         # Find apartment
-        apartment = Apartment.query.filter_by(
-            apartment_number=apartment_number.strip()
-        ).first()
+        apartment_id = get_apartment_id_by_number(apartment_number)
 
-        if not apartment:
-            logger.error(f"Apartment not found: {apartment_number}")
+        if apartment_id is None:
+            logger.error("Apartment not found: %s", apartment_number)
             return jsonify({
                 'ResultCode': 1,
                 'ResultDesc': f'Apartment {apartment_number} not found'
@@ -81,31 +111,22 @@ def mpesa_callback():
 
         # Find active tenant
         tenant = Tenant.query.filter_by(
-            apartment_id=apartment.id,
+            apartment_id=apartment_id,
             status='active'
         ).first()
 
         if not tenant:
-            logger.warning(f"No active tenant for {apartment_number}")
+            logger.warning("No active tenant for %s", apartment_number)
             # Still create payment but mark as pending
             tenant_id = None
             status = 'pending'
         else:
             tenant_id = tenant.id
-            expected_rent = float(tenant.monthly_rent)
-            
-            if amount < expected_rent:
+            if amount < tenant.monthly_rent:
                 status = 'partial'
             else:
                 status = 'completed'
 
-        # Parse payment date
-        try:
-            payment_date = datetime.strptime(trans_time, '%Y%m%d%H%M%S')
-        except ValueError:
-            logger.error(f"Invalid time format: {trans_time}")
-            payment_date = datetime.utcnow()
-
         month_paid_for = payment_date.strftime('%Y-%m')
 
         # Format phone number
@@ -115,10 +136,11 @@ def mpesa_callback():
             elif phone_number.startswith('0'):
                 phone_number = f'+254{phone_number[1:]}'
 
-        # Create payment record
-        payment = Payment(
+        # Create payment record. The unique receipt number makes the insert a
+        # no-op for a duplicate callback, so no row id comes back
+        values = dict(
             tenant_id=tenant_id,
-            apartment_id=apartment.id,
+            apartment_id=apartment_id,
             payment_date=payment_date,
             tenant_name=tenant_name,
             apartment_number=apartment_number,
@@ -129,11 +151,26 @@ def mpesa_callback():
             status=status,
             phone_number=phone_number
         )
-
-        db.session.add(payment)
+        insert = DIALECT_INSERTS[db.session.get_bind().dialect.name]
+        payment_id = db.session.scalar(
+            insert(Payment).values(**values)
+            .on_conflict_do_nothing(index_elements=['mpesa_receipt_number'])
+            .returning(Payment.id)
+        )
         db.session.commit()
+        cache.add(receipt_key, True, timeout=RECEIPT_CACHE_TIMEOUT)
 
-        logger.info(f"Payment recorded: {mpesa_receipt} - {amount}")
+        if payment_id is None:
+            logger.warning("Duplicate transaction: %s", mpesa_receipt)
+            return jsonify({
+                'ResultCode': 0,
+                'ResultDesc': 'Transaction already processed'
+            }), 200
+
+        # Unsaved copy of the new row for the SMS helpers
+        payment = Payment(id=payment_id, **values)
+
+        logger.info("Payment recorded: %s - %s", mpesa_receipt, amount)
 
         #Auto send confirmation SMS
         if status == 'completed':
@@ -142,7 +179,7 @@ def mpesa_callback():
         elif status == 'partial':
             #Send partial payment notice
             if tenant:
-                send_partial_payment_sms(payment,tenant,apartment)
+                send_partial_payment_sms(payment,tenant)
 
         return jsonify({
             'ResultCode': 0,
@@ -150,7 +187,7 @@ def mpesa_callback():
         }), 200
 
     except Exception as e:
-        logger.error(f"Callback error: {str(e)}")
+        logger.error("Callback error: %s", e)
         db.session.rollback()
         return jsonify({
             'ResultCode': 1,
@@ -167,7 +204,7 @@ def initiate_stk_push():
     """
     try:
         current_user_id = get_jwt_identity()
-        user = User.query.get(current_user_id)
+        user = db.session.get(User, int(current_user_id))
 
         if not user:
             return jsonify({'error': 'User not found'}), 404
@@ -253,7 +290,7 @@ def initiate_stk_push():
                 }), 400
 
         except Exception as e:
-            logger.error(f"STK Push error: {str(e)}")
+            logger.error("STK Push error: %s", e)
             return jsonify({
                 'success': False,
                 'error': 'Failed to send payment prompt',
@@ -261,7 +298,7 @@ def initiate_stk_push():
             }), 500
 
     except Exception as e:
-        logger.error(f"STK Push route error: {str(e)}")
+        logger.error("STK Push route error: %s", e)
         return jsonify({'error': str(e)}), 500
 
 
@@ -273,7 +310,7 @@ def stk_push_callback():
     """
     try:
         data = request.get_json()
-        logger.info(f"STK callback received: {data}")
+        logger.info("STK callback received: %s", data)
 
         # Extract callback data
         body = data.get('Body', {})
@@ -300,7 +337,7 @@ def stk_push_callback():
             mpesa_receipt = payment_details.get('MpesaReceiptNumber')
             phone_number = str(payment_details.get('PhoneNumber'))
             
-            logger.info(f"STK Push successful: {mpesa_receipt} - Amount: {amount}")
+            logger.info("STK Push successful: %s - Amount: %s", mpesa_receipt, amount)
 
             # Note: For STK Push, we don't automatically create a payment here
             # because we don't have apartment_number in the callback
@@ -309,7 +346,7 @@ def stk_push_callback():
 
         else:
             # Payment failed or cancelled
-            logger.warning(f"STK Push failed: {result_desc}")
+            logger.warning("STK Push failed: %s", result_desc)
 
         return jsonify({
             'ResultCode': 0,
@@ -317,7 +354,7 @@ def stk_push_callback():
         }), 200
 
     except Exception as e:
-        logger.error(f"STK callback error: {str(e)}")
+        logger.error("STK callback error: %s", e)
         return jsonify({
             'ResultCode': 1,
             'ResultDesc': str(e)
@@ -340,7 +377,7 @@ def query_stk_status(checkout_request_id):
         }), 200
 
     except Exception as e:
-        logger.error(f"Query error: {str(e)}")
+        logger.error("Query error: %s", e)
         return jsonify({
             'success': False,
             'error': str(e)
@@ -368,10 +405,10 @@ def verify_payment(receipt_number):
             'found': True,
             'payment': {
                 'receipt_number': payment.mpesa_receipt_number,
-                'amount': str(payment.amount),
+                'amount': payment.amount,
                 'apartment_number': payment.apartment_number,
                 'tenant_name': payment.tenant_name,
-                'payment_date': payment.payment_date.isoformat(),
+                'payment_date': payment.payment_date,
                 'month_paid_for': payment.month_paid_for,
                 'status': payment.status
             }
@@ -390,19 +427,20 @@ def get_landlord_payments():
     Get all payments for landlord's properties
     """
     try:
-        current_user_id = get_jwt_identity()
-        landlord = User.query.get(current_user_id)
-
-        if not landlord:
-            return jsonify({'error': 'User not found'}), 404
-
-        if landlord.role != 'landlord':
+        if current_role() != 'landlord':
             return jsonify({'error': 'Unauthorized. Only landlords allowed'}), 403
 
-        landlord_property_ids = [prop.id for prop in landlord.properties]
+        landlord_property_ids = current_property_ids()
 
         if not landlord_property_ids:
-            return jsonify({'payments': [], 'total_count': 0}), 200
+            return jsonify({
+                'payments': [],
+                'total_count': 0,
+                'total_amount': Decimal('0'),
+                'completed_count': 0,
+                'pending_count': 0,
+                'next_cursor': None
+            }), 200
 
         # Build query
         query = db.session.query(Payment).join(
@@ -424,10 +462,16 @@ def get_landlord_payments():
 
         status = request.args.get('status')
         if status:
+            if status not in PAYMENT_STATUSES:
+                return jsonify({'error': 'Invalid status'}), 400
             query = query.filter(Payment.status == status)
 
         month_paid_for = request.args.get('month_paid_for')
         if month_paid_for:
+            try:
+                datetime.strptime(month_paid_for, '%Y-%m')
+            except ValueError:
+                return jsonify({'error': 'Invalid month_paid_for format'}), 400
             query = query.filter(Payment.month_paid_for == month_paid_for)
 
         start_date = request.args.get('start_date')
@@ -446,47 +490,76 @@ def get_landlord_payments():
             except ValueError:
                 return jsonify({'error': 'Invalid end_date format'}), 400
 
-        # Execute query
-        payments = query.order_by(Payment.payment_date.desc()).all()
+        # Totals over every matching payment, computed by the database
+        total_count, total_amount, completed_count, pending_count = query.with_entities(
+            func.count(Payment.id),
+            func.coalesce(func.sum(Payment.amount), 0),
+            func.count(case((Payment.status == 'completed', 1))),
+            func.count(case((Payment.status == 'pending', 1)))
+        ).one()
+
+        # Execute query, loading each payment's apartment and property in the same round trip
+        query = query.options(
+            contains_eager(Payment.apartment).joinedload(Apartment.property),
+            *strict_loading_options()
+        ).order_by(Payment.payment_date.desc(), Payment.id.desc())
+
+        # Paging is opt-in: pass per_page and then the returned next_cursor as after.
+        # The cursor is "<payment_date iso>,<id>" of the last payment on the previous page
+        next_cursor = None
+        after = request.args.get('after')
+        per_page = request.args.get('per_page', type=int)
+        if per_page or after:
+            per_page = max(1, min(per_page or PAYMENTS_PAGE_SIZE, PAYMENTS_PAGE_MAX))
+            if after:
+                try:
+                    after_date, after_id = after.split(',')
+                    cursor = (datetime.fromisoformat(after_date), int(after_id))
+                except ValueError:
+                    return jsonify({'error': 'Invalid cursor'}), 400
+                query = query.filter(tuple_(Payment.payment_date, Payment.id) < cursor)
+
+            # One extra row tells us whether another page exists
+            payments = query.limit(per_page + 1).all()
+            if len(payments) > per_page:
+                payments = payments[:per_page]
+                next_cursor = f"{payments[-1].payment_date.isoformat()},{payments[-1].id}"
+        else:
+            payments = query.all()
 
         # Format response
         payments_data = []
         for payment in payments:
-            apartment = Apartment.query.get(payment.apartment_id)
-            property_info = Property.query.get(apartment.property_id) if apartment else None
+            property_info = payment.apartment.property
 
             payments_data.append({
                 'id': payment.id,
                 'tenant_name': payment.tenant_name,
                 'apartment_number': payment.apartment_number,
-                'amount': str(payment.amount),
+                'amount': payment.amount,
                 'mpesa_receipt_number': payment.mpesa_receipt_number,
                 'payment_method': payment.payment_method,
-                'payment_date': payment.payment_date.isoformat(),
+                'payment_date': payment.payment_date,
                 'month_paid_for': payment.month_paid_for,
                 'status': payment.status,
                 'phone_number': payment.phone_number,
-                'property_name': property_info.name if property_info else None,
-                'property_address': property_info.address if property_info else None,
-                'created_at': payment.created_at.isoformat(),
-                'updated_at': payment.updated_at.isoformat()
+                'property_name': property_info.name,
+                'property_address': property_info.address,
+                'created_at': payment.created_at,
+                'updated_at': payment.updated_at
             })
 
-        # Calculate summary
-        total_amount = sum(float(payment.amount) for payment in payments)
-        completed_payments = [p for p in payments if p.status == 'completed']
-        pending_payments = [p for p in payments if p.status == 'pending']
-
         return jsonify({
             'payments': payments_data,
-            'total_count': len(payments),
-            'total_amount': str(total_amount),
-            'completed_count': len(completed_payments),
-            'pending_count': len(pending_payments)
+            'total_count': total_count,
+            'total_amount': total_amount,
+            'completed_count': completed_count,
+            'pending_count': pending_count,
+            'next_cursor': next_cursor
         }), 200
 
     except Exception as e:
-        logger.error(f"Get payments error: {str(e)}")
+        logger.error("Get payments error: %s", e)
         return jsonify({'error': str(e)}), 500
 
 
@@ -497,40 +570,40 @@ def get_payment_detail(payment_id):
     Get detailed information about a specific payment
     """
     try:
-        current_user_id = get_jwt_identity()
-        landlord = User.query.get(current_user_id)
-
-        if not landlord or landlord.role != 'landlord':
+        if current_role() != 'landlord':
             return jsonify({'error': 'Unauthorized'}), 403
 
-        payment = Payment.query.get(payment_id)
-        if not payment:
+        # The payment with its unit, property and tenant details in one query,
+        # scoped to the landlord's properties
+        row = db.session.execute(
+            select(Payment, Apartment.apartment_type, Property.name, Property.address, Tenant.email)
+            .join(Apartment, Payment.apartment_id == Apartment.id)
+            .join(Property, Apartment.property_id == Property.id)
+            .outerjoin(Tenant, Payment.tenant_id == Tenant.id)
+            .where(Payment.id == payment_id, Property.landlord_id == int(get_jwt_identity()))
+        ).first()
+        if row is None:
             return jsonify({'error': 'Payment not found'}), 404
 
-        apartment = Apartment.query.get(payment.apartment_id)
-        if not apartment or apartment.property.landlord_id != landlord.id:
-            return jsonify({'error': 'Unauthorized'}), 403
-
-        tenant = Tenant.query.get(payment.tenant_id)
-        property_info = Property.query.get(apartment.property_id)
+        payment, apartment_type, property_name, property_address, tenant_email = row
 
         return jsonify({
             'id': payment.id,
             'tenant_name': payment.tenant_name,
-            'tenant_email': tenant.email if tenant else None,
+            'tenant_email': tenant_email,
             'tenant_phone': payment.phone_number,
             'apartment_number': payment.apartment_number,
-            'apartment_type': apartment.apartment_type if apartment else None,
-            'property_name': property_info.name if property_info else None,
-            'property_address': property_info.address if property_info else None,
-            'amount': str(payment.amount),
+            'apartment_type': apartment_type,
+            'property_name': property_name,
+            'property_address': property_address,
+            'amount': payment.amount,
             'mpesa_receipt_number': payment.mpesa_receipt_number,
             'payment_method': payment.payment_method,
-            'payment_date': payment.payment_date.isoformat(),
+            'payment_date': payment.payment_date,
             'month_paid_for': payment.month_paid_for,
             'status': payment.status,
-            'created_at': payment.created_at.isoformat(),
-            'updated_at': payment.updated_at.isoformat()
+            'created_at': payment.created_at,
+            'updated_at': payment.updated_at
         }), 200
 
     except Exception as e:
@@ -544,13 +617,10 @@ def get_payment_summary():
     Get payment summary statistics
     """
     try:
-        current_user_id = get_jwt_identity()
-        landlord = User.query.get(current_user_id)
-
-        if not landlord or landlord.role != 'landlord':
+        if current_role() != 'landlord':
             return jsonify({'error': 'Unauthorized'}), 403
 
-        landlord_property_ids = [prop.id for prop in landlord.properties]
+        landlord_property_ids = current_property_ids()
 
         if not landlord_property_ids:
             return jsonify({
@@ -560,8 +630,10 @@ def get_payment_summary():
                 'total_revenue': '0.00'
             }), 200
 
-        # Get payments
-        query = db.session.query(Payment).join(
+        # Count and total payments per status in the database
+        query = db.session.query(
+            Payment.status, func.count(Payment.id), func.sum(Payment.amount)
+        ).join(
             Apartment, Payment.apartment_id == Apartment.id
         ).filter(
             Apartment.property_id.in_(landlord_property_ids)
@@ -569,32 +641,33 @@ def get_payment_summary():
 
         month_year = request.args.get('month_year')
         if month_year:
+            try:
+                datetime.strptime(month_year, '%Y-%m')
+            except ValueError:
+                return jsonify({'error': 'Invalid month_year format'}), 400
             query = query.filter(Payment.month_paid_for == month_year)
 
-        payments = query.all()
+        by_status = {status: (count, amount or 0) for status, count, amount in query.group_by(Payment.status)}
 
         # Calculate statistics
-        completed = [p for p in payments if p.status == 'completed']
-        pending = [p for p in payments if p.status == 'pending']
-        partial = [p for p in payments if p.status == 'partial']
-
-        total_revenue = sum(float(p.amount) for p in completed)
-        expected_revenue = sum(float(p.amount) for p in payments)
+        completed_count, total_revenue = by_status.get('completed', (0, 0))
+        total_payments = sum(count for count, _ in by_status.values())
+        expected_revenue = sum((amount for _, amount in by_status.values()), Decimal('0'))
 
         total_apartments = db.session.query(Apartment).filter(
             Apartment.property_id.in_(landlord_property_ids)
         ).count()
 
         return jsonify({
-            'total_properties': len(landlord.properties),
+            'total_properties': len(landlord_property_ids),
             'total_apartments': total_apartments,
-            'total_payments': len(payments),
-            'completed_payments': len(completed),
-            'pending_payments': len(pending),
-            'partial_payments': len(partial),
+            'total_payments': total_payments,
+            'completed_payments': completed_count,
+            'pending_payments': by_status.get('pending', (0, 0))[0],
+            'partial_payments': by_status.get('partial', (0, 0))[0],
             'total_revenue': f'{total_revenue:.2f}',
             'expected_revenue': f'{expected_revenue:.2f}',
-            'collection_rate': f'{(len(completed) / len(payments) * 100) if payments else 0:.2f}%',
+            'collection_rate': f'{(completed_count / total_payments * 100) if total_payments else 0:.2f}%',
             'month_year': month_year if month_year else 'All time'
         }), 200
 
@@ -609,33 +682,32 @@ def get_payments_by_property():
     Get payments grouped by property
     """
     try:
-        current_user_id = get_jwt_identity()
-        landlord = User.query.get(current_user_id)
-
-        if not landlord or landlord.role != 'landlord':
+        if current_role() != 'landlord':
             return jsonify({'error': 'Unauthorized'}), 403
 
-        properties_data = []
-
-        for property_info in landlord.properties:
-            apartment_ids = [apt.id for apt in property_info.apartments]
-
-            payments = Payment.query.filter(
-                Payment.apartment_id.in_(apartment_ids)
-            ).all()
-
-            completed = [p for p in payments if p.status == 'completed']
-            total_revenue = sum(float(p.amount) for p in completed)
-
-            properties_data.append({
-                'property_id': property_info.id,
-                'property_name': property_info.name,
-                'property_address': property_info.address,
-                'total_units': property_info.total_units,
-                'total_payments': len(payments),
-                'completed_payments': len(completed),
-                'total_revenue': f'{total_revenue:.2f}'
-            })
+        # One row per property with its payment counts and completed revenue
+        rows = db.session.query(
+            Property.id, Property.name, Property.address, Property.total_units,
+            func.count(Payment.id),
+            func.count(case((Payment.status == 'completed', 1))),
+            func.coalesce(func.sum(case((Payment.status == 'completed', Payment.amount), else_=0)), 0)
+        ).select_from(Property).outerjoin(
+            Apartment, Apartment.property_id == Property.id
+        ).outerjoin(
+            Payment, Payment.apartment_id == Apartment.id
+        ).filter(
+            Property.landlord_id == int(get_jwt_identity())
+        ).group_by(Property.id).order_by(Property.id).all()
+
+        properties_data = [{
+            'property_id': property_id,
+            'property_name': name,
+            'property_address': address,
+            'total_units': total_units,
+            'total_payments': total_payments,
+            'completed_payments': completed_payments,
+            'total_revenue': f'{total_revenue:.2f}'
+        } for property_id, name, address, total_units, total_payments, completed_payments, total_revenue in rows]
 
         return jsonify({'properties': properties_data}), 200
 
@@ -1,6 +1,10 @@
 from flask import Blueprint, request, jsonify
-from models import Property,Apartment
+from models import Property,Apartment,Tenant
 from config import db
+from sqlalchemy import select, and_
+from .apartments import invalidate_apartments_cache, invalidate_apartment_numbers, APARTMENT_FIELDS
+from .auth import invalidate_property_ids
+from .tenant import invalidate_tenants_cache
 from datetime import datetime
 from flask_jwt_extended import jwt_required, get_jwt_identity   
 
@@ -34,6 +38,7 @@ def create_property():
         )
         #Save property to Db
         db.session.add(new_property)
+        invalidate_property_ids(landlord_id)
         db.session.commit()
         return jsonify({'message':'Property created successfully'}), 201
     except Exception as e:
@@ -88,6 +93,8 @@ def update_property(property_id):
         
         property.updated_at = datetime.utcnow()
         db.session.commit()
+        # Tenant lists show the property name
+        invalidate_tenants_cache(landlord_id)
         return jsonify({'message':'Property updated successfully'}), 200
     except Exception as e:
         db.session.rollback()
@@ -102,8 +109,14 @@ def delete_property(property_id):
     if not property:
         return jsonify({'error':'Property not found'}), 404
     
+    apartment_numbers = db.session.scalars(
+        select(Apartment.apartment_number).where(Apartment.property_id == property.id)
+    ).all()
     db.session.delete(property)
+    invalidate_property_ids(landlord_id)
     db.session.commit()
+    invalidate_apartments_cache(landlord_id)
+    invalidate_apartment_numbers(*apartment_numbers)
     return jsonify({'message':'Property deleted successfully'}), 200
 
 @properties_bp.route('/properties/<int:property_id>/units', methods=['POST'])
@@ -134,6 +147,8 @@ def create_unit(property_id):
 
         db.session.add(new_unit)
         db.session.commit()
+        invalidate_apartments_cache(landlord_id)
+        invalidate_apartment_numbers(data['apartment_number'].strip())
 
         return jsonify({'message':'Apartment created successfully', 'unit': new_unit.to_dict()}), 201
 
@@ -151,24 +166,34 @@ def get_units(property_id):
         if not property:
             return jsonify({'error': 'Property not found'}), 404
 
+        # Plain rows of the unit columns plus the active tenant, if any, in one
+        # Core query instead of hydrating Apartment and Tenant objects
+        rows = db.session.execute(
+            select(
+                *[getattr(Apartment, f) for f in APARTMENT_FIELDS],
+                Tenant.id.label('tenant_id'), Tenant.name.label('tenant_name'),
+                Tenant.email.label('tenant_email'), Tenant.phone.label('tenant_phone')
+            ).outerjoin(
+                Tenant, and_(Tenant.apartment_id == Apartment.id, Tenant.status == 'active')
+            ).where(Apartment.property_id == property_id).order_by(Apartment.id)
+        ).mappings()
+
         units = []
-        for unit in property.apartments:
-            unit_dict = unit.to_dict()
-            if unit.tenant and unit.tenant.status == 'active':
-                t = unit.tenant
-                name_parts = t.name.strip().split(' ', 1)
+        for row in rows:
+            unit_dict = {f: row[f] for f in APARTMENT_FIELDS}
+            if row['tenant_id'] is not None:
+                name_parts = row['tenant_name'].strip().split(' ', 1)
                 unit_dict['tenant'] = {
-                    'id': t.id,
+                    'id': row['tenant_id'],
                     'first_name': name_parts[0],
                     'last_name': name_parts[1] if len(name_parts) > 1 else '',
-                    'email': t.email,
-                    'phone': t.phone,
+                    'email': row['tenant_email'],
+                    'phone': row['tenant_phone'],
                 }
             else:
                 unit_dict['tenant'] = None
             units.append(unit_dict)
 
-        # ↑ return must be at this indentation level, outside the for loop
         return jsonify({
             'property': property.to_dict(),
             'units': units
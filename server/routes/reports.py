@@ -3,6 +3,8 @@ from flask_jwt_extended import jwt_required, get_jwt_identity
 from config import db
 from models import Invoice, Tenant, User, Apartment, Property, Payment
 from datetime import datetime, date
+from decimal import Decimal
+from collections import Counter, defaultdict
 from dateutil.relativedelta import relativedelta
 from sqlalchemy import func
 
@@ -41,33 +43,31 @@ def get_overview():
             Tenant.status == 'active'
         ).count()
 
-        # Current month revenue
+        # All-time and current month revenue in one pass over completed payments
         current_month = date.today().strftime('%Y-%m')
-        month_payments = Payment.query.filter(
+        completed = db.session.query(Payment.month_paid_for, Payment.amount).filter(
             Payment.apartment_id.in_(apartment_ids),
-            Payment.month_paid_for == current_month,
             Payment.status == 'completed'
-        ).all()
-        current_month_revenue = sum(float(p.amount) for p in month_payments)
-
-        # All-time revenue
-        all_payments = Payment.query.filter(
-            Payment.apartment_id.in_(apartment_ids),
-            Payment.status == 'completed'
-        ).all()
-        total_revenue = sum(float(p.amount) for p in all_payments)
-
-        # Outstanding invoices
-        outstanding = Invoice.query.filter(
+        )
+        total_revenue = current_month_revenue = Decimal('0')
+        for month_paid_for, amount in completed:
+            total_revenue += amount
+            if month_paid_for == current_month:
+                current_month_revenue += amount
+
+        # Outstanding and overdue invoices in one pass
+        today = date.today()
+        outstanding = db.session.query(Invoice.total_amount, Invoice.due_date).filter(
             Invoice.apartment_id.in_(apartment_ids),
             Invoice.status.in_(['pending', 'overdue'])
-        ).all()
-        outstanding_amount = sum(float(i.total_amount) for i in outstanding)
-
-        # Overdue invoices
-        today = date.today()
-        overdue = [i for i in outstanding if i.due_date and i.due_date < today]
-        overdue_amount = sum(float(i.total_amount) for i in overdue)
+        )
+        outstanding_amount = overdue_amount = Decimal('0')
+        overdue_count = 0
+        for total_amount, due_date in outstanding:
+            outstanding_amount += total_amount
+            if due_date and due_date < today:
+                overdue_amount += total_amount
+                overdue_count += 1
 
         return jsonify({
             'total_properties': len(user.properties),
@@ -80,7 +80,7 @@ def get_overview():
             'total_revenue': f'{total_revenue:.2f}',
             'outstanding_amount': f'{outstanding_amount:.2f}',
             'overdue_amount': f'{overdue_amount:.2f}',
-            'overdue_count': len(overdue),
+            'overdue_count': overdue_count,
             'current_month': current_month,
         }), 200
 
@@ -100,33 +100,35 @@ def get_revenue_trend():
         apartment_ids = [a[0] for a in db.session.query(Apartment.id).filter(
             Apartment.property_id.in_(property_ids)).all()]
 
-        months = []
         today  = date.today()
-        for i in range(5, -1, -1):
-            d     = today - relativedelta(months=i)
-            month = d.strftime('%Y-%m')
-            label = d.strftime('%b %Y')
-
-            payments = Payment.query.filter(
-                Payment.apartment_id.in_(apartment_ids),
-                Payment.month_paid_for == month,
-                Payment.status == 'completed'
-            ).all()
-            revenue = sum(float(p.amount) for p in payments)
+        window = [today - relativedelta(months=i) for i in range(5, -1, -1)]
+        month_keys = [d.strftime('%Y-%m') for d in window]
 
-            invoices_for_month = Invoice.query.filter(
-                Invoice.apartment_id.in_(apartment_ids),
-                Invoice.month_year == month
-            ).all()
-            expected = sum(float(i.total_amount) for i in invoices_for_month)
+        # Payments and invoices for the whole window, tallied per month in a single pass
+        payment_counts = Counter()
+        revenue = defaultdict(Decimal)
+        for month, amount in db.session.query(Payment.month_paid_for, Payment.amount).filter(
+            Payment.apartment_id.in_(apartment_ids),
+            Payment.month_paid_for.in_(month_keys),
+            Payment.status == 'completed'
+        ):
+            payment_counts[month] += 1
+            revenue[month] += amount
 
-            months.append({
-                'month': month,
-                'label': label,
-                'revenue': round(revenue, 2),
-                'expected': round(expected, 2),
-                'payment_count': len(payments),
-            })
+        expected = defaultdict(Decimal)
+        for month, total_amount in db.session.query(Invoice.month_year, Invoice.total_amount).filter(
+            Invoice.apartment_id.in_(apartment_ids),
+            Invoice.month_year.in_(month_keys)
+        ):
+            expected[month] += total_amount
+
+        months = [{
+            'month': month,
+            'label': d.strftime('%b %Y'),
+            'revenue': float(revenue[month]),
+            'expected': float(expected[month]),
+            'payment_count': payment_counts[month],
+        } for d, month in zip(window, month_keys)]
 
         return jsonify({'trend': months}), 200
 
@@ -211,6 +213,10 @@ def get_property_report():
             return err, code
 
         month_year = request.args.get('month_year', date.today().strftime('%Y-%m'))
+        try:
+            datetime.strptime(month_year, '%Y-%m')
+        except ValueError:
+            return jsonify({'error': 'Invalid month_year format'}), 400
         result = []
 
         for prop in user.properties:
@@ -229,8 +235,8 @@ def get_property_report():
                 Invoice.month_year == month_year
             ).all()
 
-            revenue  = sum(float(p.amount) for p in payments)
-            expected = sum(float(i.total_amount) for i in invoices)
+            revenue  = sum((p.amount for p in payments), Decimal('0'))
+            expected = sum((i.total_amount for i in invoices), Decimal('0'))
 
             result.append({
                 'property_id': prop.id,
@@ -240,9 +246,9 @@ def get_property_report():
                 'occupied_units': occupied,
                 'vacant_units': prop.total_units - occupied,
                 'occupancy_rate': round(occupied / prop.total_units * 100, 1) if prop.total_units else 0,
-                'revenue': round(revenue, 2),
-                'expected': round(expected, 2),
-                'collection_rate': round(revenue / expected * 100, 1) if expected else 0,
+                'revenue': float(revenue),
+                'expected': float(expected),
+                'collection_rate': float(round(revenue / expected * 100, 1)) if expected else 0,
                 'payment_count': len(payments),
             })
 
@@ -1,11 +1,65 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, g, Response
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from models import Apartment, Property,Tenant,Payment
-from config import db   
+from config import db, cache, cache_successful, cache_version, strict_loading_options, orjson_default, SHARED_CACHE, CACHE_TIMEOUT_SHORT, CACHE_TIMEOUT_LONG
+from sqlalchemy import exists, update
+from sqlalchemy.orm import contains_eager, load_only
+from sqlalchemy.orm.attributes import set_committed_value
+from .apartments import invalidate_apartments_cache, apartments_cache_version
 from datetime import datetime,date
+from decimal import Decimal
+import orjson
+import uuid
 
 # Blueprint for tenant routes
 tenant_bp = Blueprint('tenant', __name__)
+
+# The cached tenant list is keyed by the landlord's tenant version and their
+# apartments version, so unit renames and deletes invalidate it too. Without
+# Redis an invalidation only reaches the current worker, so other workers'
+# copies are kept short
+TENANTS_CACHE_TIMEOUT = CACHE_TIMEOUT_LONG if SHARED_CACHE else CACHE_TIMEOUT_SHORT
+
+def tenants_cache_key():
+    landlord_id = get_jwt_identity()
+    version = cache_version(f'tenants:{landlord_id}:version')
+    return f"tenants:{landlord_id}:{version}:{apartments_cache_version(landlord_id)}"
+
+def invalidate_tenants_cache(landlord_id):
+    cache.set(f'tenants:{landlord_id}:version', uuid.uuid4().hex, timeout=0)
+
+#A landlord's tenant, with its apartment and property filled from the ownership join.
+#Kept on flask.g for the request; passing populate_existing=True re-reads the row
+def get_landlord_tenant(tenant_id, landlord_id, **execution_options):
+    owned = g.setdefault('owned_tenants', {})
+    key = (tenant_id, landlord_id)
+    if key not in owned or execution_options:
+        owned[key] = Tenant.query.join(Tenant.apartment).join(Apartment.property).options(
+            contains_eager(Tenant.apartment).contains_eager(Apartment.property)
+        ).filter(
+            Tenant.id == tenant_id,
+            Property.landlord_id == landlord_id
+        ).execution_options(**execution_options).first()
+    return owned[key]
+
+TENANT_REQUIRED_FIELDS = ['name','email','phone','apartment_id']
+
+# Correlated EXISTS for an apartment's active tenant, selected alongside the
+# apartment so the occupancy checks share its round-trip
+HAS_ACTIVE_TENANT = exists().where(
+    Tenant.apartment_id == Apartment.id, Tenant.status == 'active'
+).correlate(Apartment).label('has_active_tenant')
+
+# Rows fetched per round-trip when listing tenants
+TENANTS_BATCH_SIZE = 500
+
+#Strip the required fields once; returns the cleaned values and the first missing field
+def clean_tenant_fields(data):
+    #A JSON null counts as missing rather than the string 'None'
+    clean = {field: str(data.get(field) if data.get(field) is not None else '').strip() for field in TENANT_REQUIRED_FIELDS}
+    missing = next((field for field, value in clean.items() if not value), None)
+    return clean, missing
+
 # Create a new tenant
 @tenant_bp.route('/tenants', methods=['POST'])
 @jwt_required()
@@ -14,28 +68,34 @@ def create_tenant():
         data = request.get_json()
         landlord_id = int(get_jwt_identity())
         #Validate required fields
-        required_fields = ['name','email','phone','apartment_id']
-        for field in required_fields:
-            if field not in data or not str(data[field]).strip():
-                return jsonify({'error': f'{field} is required'}), 400 
-        #Check if apartment exists and belongs to landlord
-        apartment = Apartment.query.join(Property).filter(Apartment.id == data['apartment_id'], Property.landlord_id == landlord_id).first()
-        if not apartment:
+        clean, missing = clean_tenant_fields(data)
+        if missing:
+            return jsonify({'error': f'{missing} is required'}), 400 
+        #Check if apartment exists, belongs to landlord and is free in one query,
+        #reading only the columns used here and by the new tenant's to_dict()
+        row = db.session.query(Apartment, HAS_ACTIVE_TENANT).join(Apartment.property).options(
+            load_only(Apartment.id, Apartment.status, Apartment.rent_amount, Apartment.apartment_number),
+            contains_eager(Apartment.property).load_only(Property.id, Property.name)
+        ).filter(
+            Apartment.id == data['apartment_id'], Property.landlord_id == landlord_id
+        ).first()
+        if not row:
             return jsonify({'error':'Apartment not found or does not belong to landlord'}), 404 
+        apartment, has_active_tenant = row
         
         if apartment.status == 'occupied':
             return jsonify({'error':'Apartment is already occupied'}), 400
         
-        if apartment.tenant and apartment.tenant.status == 'active':
+        if has_active_tenant:
             return jsonify({'error':'Apartment already has an active tenant'}), 400
         
         #Create new tenant
         new_tenant = Tenant(
             user_id = landlord_id,
-            name = data['name'].strip(),
-            email = data['email'].strip(),      
-            phone = data['phone'].strip(),
-            apartment_id = data['apartment_id'],
+            name = clean['name'],
+            email = clean['email'],
+            phone = clean['phone'],
+            apartment_id = apartment.id,
             lease_start_date = data.get('lease_start_date'),
             lease_end_date = data.get('lease_end_date', None),
             status = 'active',
@@ -43,26 +103,110 @@ def create_tenant():
             security_deposit_paid = data.get('security_deposit', 0)
         )
 
-        #Save tenant to Db
+        #Save tenant to Db. The flush fills in the id and timestamps, so the
+        #response is built from the new object without selecting it again
         db.session.add(new_tenant)
-        apartment.status = 'occupied'
+        db.session.execute(update(Apartment).where(Apartment.id == apartment.id).values(status='occupied'))
         db.session.flush()
+        set_committed_value(new_tenant, 'apartment', apartment)
+        tenant = new_tenant.to_dict()
         db.session.commit()
-        return jsonify({'message':'Tenant created successfully'}), 201
+        invalidate_apartments_cache(landlord_id)
+        invalidate_tenants_cache(landlord_id)
+        return jsonify({'message':'Tenant created successfully', 'tenant': tenant}), 201
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500 
             
+#Create many tenants at once (CSV import): the apartments are checked in one query
+#and the tenants written in one batched INSERT
+@tenant_bp.route('/tenants/bulk', methods=['POST'])
+@jwt_required()
+def create_tenants_bulk():
+    try:
+        data = request.get_json()
+        landlord_id = int(get_jwt_identity())
+        rows = data.get('tenants')
+        if not rows or not isinstance(rows, list):
+            return jsonify({'error': 'tenants must be a non-empty list'}), 400
+        #Validate required fields
+        cleaned = []
+        apartment_ids = []
+        for index, row in enumerate(rows):
+            if not isinstance(row, dict):
+                return jsonify({'error': f'tenants[{index}]: must be an object'}), 400
+            clean, missing = clean_tenant_fields(row)
+            if missing:
+                return jsonify({'error': f'tenants[{index}]: {missing} is required'}), 400
+            try:
+                apartment_ids.append(int(row['apartment_id']))
+            except (TypeError, ValueError):
+                return jsonify({'error': f'tenants[{index}]: apartment_id must be an integer'}), 400
+            cleaned.append(clean)
+
+        if len(set(apartment_ids)) != len(apartment_ids):
+            return jsonify({'error': 'Each apartment can only be given one tenant'}), 400
+
+        #Apartments that exist and belong to landlord, reading only the columns used here
+        apartments = {apartment.id: apartment for apartment in db.session.query(
+            Apartment.id, Apartment.status, Apartment.rent_amount, HAS_ACTIVE_TENANT
+        ).join(Property).filter(
+            Apartment.id.in_(apartment_ids), Property.landlord_id == landlord_id
+        )}
+        for index, apartment_id in enumerate(apartment_ids):
+            apartment = apartments.get(apartment_id)
+            if not apartment:
+                return jsonify({'error': f'tenants[{index}]: Apartment not found or does not belong to landlord'}), 404
+            if apartment.status == 'occupied':
+                return jsonify({'error': f'tenants[{index}]: Apartment is already occupied'}), 400
+            if apartment.has_active_tenant:
+                return jsonify({'error': f'tenants[{index}]: Apartment already has an active tenant'}), 400
+
+        db.session.bulk_insert_mappings(Tenant, [{
+            'user_id': landlord_id,
+            'name': clean['name'],
+            'email': clean['email'],
+            'phone': clean['phone'],
+            'apartment_id': apartment_id,
+            'lease_start_date': row.get('lease_start_date'),
+            'lease_end_date': row.get('lease_end_date', None),
+            'status': 'active',
+            'monthly_rent': row.get('monthly_rent', apartments[apartment_id].rent_amount),
+            'security_deposit_paid': row.get('security_deposit', 0)
+        } for row, clean, apartment_id in zip(rows, cleaned, apartment_ids)])
+        db.session.execute(update(Apartment).where(Apartment.id.in_(apartment_ids)).values(status='occupied'))
+        db.session.commit()
+        invalidate_apartments_cache(landlord_id)
+        invalidate_tenants_cache(landlord_id)
+        return jsonify({'message': f'{len(rows)} tenants created successfully', 'created': len(rows)}), 201
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
 #Get all tenants for a property
 @tenant_bp.route('/tenants', methods=['GET'])
 @jwt_required()
+@cache.cached(timeout=TENANTS_CACHE_TIMEOUT, make_cache_key=tenants_cache_key, response_filter=cache_successful)
 def get_tenants():
     try:
         landlord_id = int(get_jwt_identity())
-        db.session.expire_all()  # Clear session cache 
-        tenants = Tenant.query.join(Apartment).join(Property).filter(Property.landlord_id == landlord_id).all()
-        tenants_list = [tenant.to_dict() for tenant in tenants]
-        return jsonify({'tenants': tenants_list}), 200
+        # The joined apartment and property rows fill tenant.apartment.property
+        # for to_dict(), so the whole list is one SELECT. to_dict() reads every
+        # tenant column but only the unit number and property name of the joins.
+        # Ownership is checked on the joined property row, not the token's claim
+        tenants = Tenant.query.join(Tenant.apartment).join(Apartment.property).options(
+            contains_eager(Tenant.apartment).load_only(Apartment.id, Apartment.apartment_number)
+                .contains_eager(Apartment.property).load_only(Property.id, Property.name),
+            *strict_loading_options()
+        ).filter(Property.landlord_id == landlord_id)
+
+        # Fetch in batches and encode row by row, so neither the full ORM result
+        # nor a list of dicts is held in memory alongside the response body
+        rows = tenants.yield_per(TENANTS_BATCH_SIZE)
+        body = b'{"tenants":[' + b','.join(
+            orjson.dumps(tenant.to_dict(), default=orjson_default) for tenant in rows
+        ) + b']}'
+        return Response(body, mimetype='application/json'), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
     
@@ -74,10 +218,7 @@ def update_tenant(tenant_id):
         data = request.get_json()
         landlord_id = int(get_jwt_identity())
 
-        tenant = Tenant.query.join(Apartment).join(Property).filter(
-            Tenant.id == tenant_id,
-            Property.landlord_id == landlord_id
-        ).first()
+        tenant = get_landlord_tenant(tenant_id, landlord_id)
 
         if not tenant:
             return jsonify({'error': 'Tenant not found or does not belong to landlord'}), 404
@@ -108,7 +249,8 @@ def update_tenant(tenant_id):
 
         tenant.updated_at = datetime.utcnow()
         db.session.commit()
-        db.session.refresh(tenant)
+        invalidate_tenants_cache(landlord_id)
+        tenant = get_landlord_tenant(tenant_id, landlord_id, populate_existing=True)
         return jsonify({'message': 'Tenant updated successfully', 'tenant': tenant.to_dict()}), 200
 
     except Exception as e:
@@ -123,8 +265,7 @@ def create_lease(tenant_id):
         data = request.get_json()
         landlord_id = int(get_jwt_identity())
         # Find tenant and ensure it belongs to landlord
-        tenant = Tenant.query.join(Apartment).join(Property)\
-            .filter(Tenant.id == tenant_id, Property.landlord_id == landlord_id).first()
+        tenant = get_landlord_tenant(tenant_id, landlord_id)
 
         if not tenant:
             return jsonify({'error': 'Tenant not found or does not belong to landlord'}), 404
@@ -145,6 +286,8 @@ def create_lease(tenant_id):
             tenant.status = 'active'  
 
         db.session.commit()
+        invalidate_tenants_cache(landlord_id)
+        tenant = get_landlord_tenant(tenant_id, landlord_id, populate_existing=True)
         return jsonify({'message': 'Lease agreement created successfully', 'tenant': tenant.to_dict()}), 201
 
     except Exception as e:
@@ -157,7 +300,7 @@ def delete_tenant(tenant_id):
     try:
         landlord_id = int(get_jwt_identity())
         #Check if tenant exists and belongs to landlord
-        tenant = Tenant.query.join(Apartment).join(Property).filter(Tenant.id == tenant_id, Property.landlord_id == landlord_id).first()
+        tenant = get_landlord_tenant(tenant_id, landlord_id)
         if not tenant:
             return jsonify({'error':'Tenant not found or does not belong to landlord'}), 404 
         
@@ -166,6 +309,8 @@ def delete_tenant(tenant_id):
         
         db.session.delete(tenant)
         db.session.commit()
+        invalidate_apartments_cache(landlord_id)
+        invalidate_tenants_cache(landlord_id)
         return jsonify({'message':'Tenant deleted successfully'}), 200
     except Exception as e:
         db.session.rollback()
@@ -177,10 +322,7 @@ def delete_tenant(tenant_id):
 def get_tenant(tenant_id):
     try:
         landlord_id = int(get_jwt_identity())
-        tenant = Tenant.query.join(Apartment).join(Property).filter(
-            Tenant.id == tenant_id,
-            Property.landlord_id == landlord_id
-        ).first()
+        tenant = get_landlord_tenant(tenant_id, landlord_id)
         if not tenant:
             return jsonify({'error': 'Tenant not found'}), 404
 
@@ -189,14 +331,14 @@ def get_tenant(tenant_id):
             .order_by(Payment.payment_date.desc()).all()
 
         # Calculate total paid and outstanding
-        total_paid = sum(float(p.amount) for p in payments if p.status == 'completed')
+        total_paid = sum((p.amount for p in payments if p.status == 'completed'), Decimal('0'))
         
         # Months since lease start
         lease_start = tenant.lease_start_date
         today = date.today()
         months_active = (today.year - lease_start.year) * 12 + (today.month - lease_start.month) + 1
-        total_expected = float(tenant.monthly_rent) * max(months_active, 1)
-        outstanding = max(total_expected - total_paid, 0)
+        total_expected = tenant.monthly_rent * max(months_active, 1)
+        outstanding = max(total_expected - total_paid, Decimal('0'))
 
         # Days until lease expires
         days_until_expiry = None
@@ -1,11 +1,130 @@
+import atexit
 import os
 from dotenv import load_dotenv
 import africastalking
 import logging
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 
 load_dotenv()
 logger = logging.getLogger(__name__)
 
+#Queued SMS are flushed every SMS_BATCH_WINDOW seconds, or sooner once
+#SMS_BATCH_SIZE are waiting. Messages with identical text share one API call
+SMS_BATCH_SIZE = 100
+SMS_BATCH_WINDOW = 2
+SMS_RETRY_ATTEMPTS = 3
+SMS_RETRY_DELAY = 1
+#On shutdown, how long to wait for queued SMS; kept under gunicorn's graceful_timeout
+SMS_DRAIN_TIMEOUT = 20
+
+#Africa's Talking limits recipients per request; bigger sends are split into
+#chunks of SMS_CHUNK_SIZE that go out concurrently
+SMS_CHUNK_SIZE = 100
+SMS_SEND_WORKERS = 8
+
+#Keep-alive pool shared by every Africa's Talking call; sized above
+#SMS_SEND_WORKERS so concurrent chunks never wait for a connection
+SMS_POOL_SIZE = 32
+
+#Phone numbers are normalised to +254 format: separators and '+' are dropped in
+#one translate() pass, then the first digit picks the prefix
+PHONE_STRIP = str.maketrans('', '', ' -+')
+PHONE_PREFIXES = {
+    '0': lambda phone: f'+254{phone[1:]}',
+    '7': lambda phone: f'+254{phone}',
+    '1': lambda phone: f'+254{phone}',
+}
+DEFAULT_PHONE_PREFIX = lambda phone: f'+{phone}'
+
+class SMSBatchQueue:
+    """
+    Collects SMS from request handlers and sends them from a background thread
+    """
+    def __init__(self,client):
+        self.client = client
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker = None
+
+    def put(self,phone_number,message):
+        self._ensure_worker()
+        self._queue.put((phone_number,message))
+
+    def _ensure_worker(self):
+        #Started on first use so forked gunicorn workers each get their own thread
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name='sms-batch', daemon=True)
+                self._worker.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + SMS_BATCH_WINDOW
+            while len(batch) < SMS_BATCH_SIZE:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                self.flush(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def flush_all(self,timeout=SMS_DRAIN_TIMEOUT):
+        """
+        Send everything still queued. Run at exit so a deploy or worker
+        restart does not drop SMS waiting for the next batch
+        """
+        batch = []
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if batch:
+            try:
+                self.flush(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+        #The worker thread may be part way through a batch it already took. Polled,
+        #as gevent's patched Queue has no condition to wait on
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.1)
+        if self._queue.unfinished_tasks:
+            logger.error("%s queued SMS were not sent before shutdown", self._queue.unfinished_tasks)
+
+    def flush(self,batch):
+        recipients_by_message = {}
+        for phone_number, message in batch:
+            recipients_by_message.setdefault(message, []).append(phone_number)
+
+        for message, recipients in recipients_by_message.items():
+            for attempt in range(1, SMS_RETRY_ATTEMPTS + 1):
+                result = self.client.send_bulk_sms(recipients,message)
+                if result['status'] == 'success':
+                    break
+                #Only the chunks that failed are sent again
+                recipients = result.get('failed_recipients', recipients)
+                if attempt < SMS_RETRY_ATTEMPTS:
+                    time.sleep(SMS_RETRY_DELAY * attempt)
+            else:
+                logger.error("Queued SMS to %s recipients failed after %s attempts: %s", len(recipients), SMS_RETRY_ATTEMPTS, result.get('error'))
+
 class SMSClient:
     """
     Handles all SMS notifications for the property management system
@@ -16,6 +135,34 @@ class SMSClient:
         self.sender_id = os.getenv('AFRICASTALKING_SENDER_ID') or None
         africastalking.initialize(self.username, self.api_key)
         self.sms = africastalking.SMS
+        self._session = self._build_session()
+        self._use_session(self.sms)
+        self.batch_queue = SMSBatchQueue(self)
+
+    def _build_session(self):
+        session = requests.Session()
+        #Only connection failures are retried, a POST that reached the API is not resent
+        adapter = HTTPAdapter(
+            pool_connections=SMS_POOL_SIZE,
+            pool_maxsize=SMS_POOL_SIZE,
+            max_retries=Retry(total=3, connect=3, read=0, status=0, backoff_factor=0.2)
+        )
+        session.mount('https://', adapter)
+        return session
+
+    def _use_session(self,service):
+        #The SDK calls requests.get/post directly, opening a new TLS connection
+        #per message. Shadow its private request helpers so they use our pool
+        def make_request(method):
+            def request(url, headers, data, params, callback=None, timeout=None):
+                res = self._session.request(method, url=url, headers=headers, params=params, data=data, timeout=timeout)
+                if not callback:
+                    return res
+                callback(res)
+            return request
+
+        service._Service__make_get_request = make_request('GET')
+        service._Service__make_post_request = make_request('POST')
 
     def send_sms(self,phone_number,message):
         """
@@ -29,13 +176,13 @@ class SMSClient:
                 recipients = [phone_number],
                 # sender_id = self.sender_id
             )
-            logger.info(f"SMS sent to {phone_number}:{response}")
+            logger.info("SMS sent to %s: %s", phone_number, response)
             return {
                 'status': 'success',
                 'response': response
             }
         except Exception as e:
-            logger.error(f"Failed to send SMS to {phone_number}:{str(e)}")
+            logger.error("Failed to send SMS to %s: %s", phone_number, e)
             return{
                 'status':'error',
                 'error':str(e)
@@ -43,50 +190,115 @@ class SMSClient:
     
     def send_bulk_sms(self,recipients,message):
         """
-        Send SMS to multiple recipients
+        Send SMS to multiple recipients, SMS_CHUNK_SIZE per API call
         """
         try:
             formatted_recipients = [
                 self._format_phone_number(phone)
                 for phone in recipients
             ]
-
-            response =self.sms.send(
-                message = message,
-                recipients = formatted_recipients,
-                # sender_id = self.sender_id
-            )
-            logger.info(f"Bulk SMS sent to {len(formatted_recipients)} recipients")
-            return{
-                'status':'success',
-                'response':'response'
-            }
         except Exception as e:
-            logger.error(f"Failed to send bulk SMS:{str(e)}")
+            logger.error("Failed to send bulk SMS: %s", e)
             return{
                 'status':'error',
                 'error':str(e)
             }
+
+        chunks = [
+            formatted_recipients[i:i + SMS_CHUNK_SIZE]
+            for i in range(0, len(formatted_recipients), SMS_CHUNK_SIZE)
+        ]
+        send_chunk = lambda chunk: self._send_chunk(chunk,message)
+        if len(chunks) > 1:
+            with ThreadPoolExecutor(max_workers=min(SMS_SEND_WORKERS, len(chunks)), thread_name_prefix='sms-send') as executor:
+                results = list(executor.map(send_chunk, chunks))
+        else:
+            results = [send_chunk(chunk) for chunk in chunks]
+
+        responses = [result['response'] for result in results if result['status'] == 'success']
+        failed = [(chunk, result['error']) for chunk, result in zip(chunks, results) if result['status'] != 'success']
+        logger.info("Bulk SMS sent to %s of %s recipients", len(formatted_recipients) - sum(len(chunk) for chunk, _ in failed), len(formatted_recipients))
+        if failed:
+            return{
+                'status':'error',
+                'error':'; '.join(error for _, error in failed),
+                'failed_recipients':[phone for chunk, _ in failed for phone in chunk],
+                'response':responses
+            }
+        return{
+            'status':'success',
+            'response':responses
+        }
+
+    def _send_chunk(self,recipients,message):
+        try:
+            response = self.sms.send(
+                message = message,
+                recipients = recipients,
+                # sender_id = self.sender_id
+            )
+            return {'status':'success','response':response}
+        except Exception as e:
+            logger.error("Failed to send bulk SMS to %s recipients: %s", len(recipients), e)
+            return {'status':'error','error':str(e)}
         
+    def payment_reminder_message(self,tenant_name,amount,house_name,tenant_id,due_date):
+        return (
+            f"Dear {tenant_name}, your rent of KES {amount:,.0f} for {house_name}"
+            f" is due on {due_date}. Please pay via M-Pesa Paybill 174379. "
+            f"Account: {house_name}. Ref: {tenant_id}"
+        )
+
     def send_payment_reminder(self,tenant_name,phone_number,amount,house_name,tenant_id,due_date):
             """
             Send payment remainder to tenant
             """
-            message = (
-            f"Dear {tenant_name}, your rent of KES {amount:,.0f} for {house_name}"
-            f" is due on {due_date}. Please pay via M-Pesa Paybill 174379. "
-            f"Account: {house_name}. Ref: {tenant_id}"
-            )
+            message = self.payment_reminder_message(tenant_name,amount,house_name,tenant_id,due_date)
             return self.send_sms(phone_number,message)
-    
-    def send_payment_confirmation(self,tenant_name,amount,phone_number,house_name,mpesa_ref):
+
+    def send_payment_reminders(self,batch):
         """
-        Send payment confirmation to tenant
+        Send payment reminders for a list of send_payment_reminder keyword
+        arguments. Reminders with the same text share one bulk send, and the
+        per-reminder results come back in batch order
         """
-        message = (
+        indexes_by_message = {}
+        for index, job in enumerate(batch):
+            message = self.payment_reminder_message(
+                job['tenant_name'], job['amount'], job['house_name'], job['tenant_id'], job['due_date']
+            )
+            indexes_by_message.setdefault(message, []).append(index)
+
+        groups = list(indexes_by_message.items())
+        send_group = lambda group: self.send_bulk_sms([batch[index]['phone_number'] for index in group[1]], group[0])
+        if len(groups) > 1:
+            with ThreadPoolExecutor(max_workers=min(SMS_SEND_WORKERS, len(groups)), thread_name_prefix='sms-send') as executor:
+                group_results = list(executor.map(send_group, groups))
+        else:
+            group_results = [send_group(group) for group in groups]
+
+        results = [None] * len(batch)
+        for (_, indexes), result in zip(groups, group_results):
+            #A partly failed group only fails the recipients in its failed chunks
+            failed = result.get('failed_recipients')
+            for index in indexes:
+                if failed is not None and self._format_phone_number(batch[index]['phone_number']) not in failed:
+                    results[index] = {'status':'success','response':result['response']}
+                else:
+                    results[index] = result
+        return results
+    
+    def payment_confirmation_message(self,tenant_name,amount,house_name,mpesa_ref):
+        return (
             f"Dear {tenant_name}, we have received your payment of KES {amount:,.0f} "
             f"for {house_name}. M-Pesa Ref: {mpesa_ref}. Thank you!"            
         )
+
+    def send_payment_confirmation(self,tenant_name,amount,phone_number,house_name,mpesa_ref):
+        """
+        Send payment confirmation to tenant
+        """
+        message = self.payment_confirmation_message(tenant_name,amount,house_name,mpesa_ref)
         return self.send_sms(phone_number,message)
     
     def send_overdue_notice(self,tenant_name,phone_number,amount,house_name,days_overdue):
@@ -101,15 +313,18 @@ class SMSClient:
 
         return self.send_sms(phone_number,message)
     
-    def send_partial_payment_notice(self,tenant_name,phone_number,amount_paid,amount_due,balance,house_name):
-        """
-        Send Partial payment notice to tenant
-        """
-        message = (
+    def partial_payment_message(self,tenant_name,amount_paid,amount_due,balance,house_name):
+        return (
             f"Dear {tenant_name}, we received KES {amount_paid:,.0f} for {house_name}. "
             f"Your balance is KES {balance:,.0f} out of KES {amount_due:,.0f}. "
             f"Please pay the remaining amount soon."            
         )
+
+    def send_partial_payment_notice(self,tenant_name,phone_number,amount_paid,amount_due,balance,house_name):
+        """
+        Send Partial payment notice to tenant
+        """
+        message = self.partial_payment_message(tenant_name,amount_paid,amount_due,balance,house_name)
         return self.send_sms(phone_number,message)
     
     def send_custom_message(self,phone_number,message):
@@ -117,25 +332,24 @@ class SMSClient:
         Send a custom message to tenant
         """
         return self.send_sms(phone_number,message)
+
+    def queue_sms(self,phone_number,message):
+        """
+        Queue an SMS for the next batch instead of sending it now
+        """
+        self.batch_queue.put(phone_number,message)
     
-    def _format_phone_number(self,phone_number):
+    @staticmethod
+    @lru_cache(maxsize=4096)
+    def _format_phone_number(phone_number):
         """
-        Format phone number to +254 format
+        Format phone number to +254 format. Cached, as bulk sends and
+        retries format the same numbers again
         """
-        phone_number = phone_number.replace(' ', '').replace('-', '').replace('+', '')
-
-        #COnvert to +254 format
-        if phone_number.startswith('0'):
-            phone_number = f'+254{phone_number[1:]}'
-        elif phone_number.startswith('254'):
-            phone_number = f'+{phone_number}'
-        elif phone_number.startswith('7') or phone_number.startswith('1'):
-            phone_number = f'+254{phone_number}'
-        else:
-            if not phone_number.startswith('+'):
-                phone_number = f'+{phone_number}'
-        return phone_number
+        phone_number = phone_number.translate(PHONE_STRIP)
+        return PHONE_PREFIXES.get(phone_number[:1], DEFAULT_PHONE_PREFIX)(phone_number)
 
 sms_client = SMSClient()
+atexit.register(sms_client.batch_queue.flush_all)
        
 
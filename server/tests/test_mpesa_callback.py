@@ -0,0 +1,60 @@
+"""
+M-Pesa C2B callback validation
+
+Run from server/: python -m unittest discover tests
+"""
+
+import os
+import tempfile
+import unittest
+
+os.environ.update(
+    DATABASE_URL='sqlite:///' + os.path.join(tempfile.mkdtemp(), 'test.db'),
+    JWT_SECRET_KEY='test-jwt-secret-key-that-is-long-enough',
+    AFRICASTALKING_USERNAME='sandbox',
+    AFRICASTALKING_API_KEY='test',
+    BCRYPT_LOG_ROUNDS='4',
+)
+
+from app import app
+from config import db
+from models import Payment
+
+
+CALLBACK = {
+    'TransID': 'RKTQDM7W6S',
+    'BillRefNumber': 'A1',
+    'TransAmount': '1000',
+    'MSISDN': '254711111111',
+    'TransTime': '20250105101010',
+}
+
+
+class MpesaCallbackValidationTest(unittest.TestCase):
+    def setUp(self):
+        with app.app_context():
+            db.create_all()
+        self.client = app.test_client()
+
+    def tearDown(self):
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def test_null_required_fields_are_rejected(self):
+        for field in ('TransID', 'BillRefNumber', 'MSISDN', 'TransTime'):
+            with self.subTest(field=field):
+                response = self.client.post('/api/payments/mpesa/callback', json=dict(CALLBACK, **{field: None}))
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.get_json(), {'ResultCode': 1, 'ResultDesc': 'Missing required fields'})
+
+        with app.app_context():
+            self.assertEqual(Payment.query.count(), 0)
+
+    def test_blank_required_fields_are_rejected(self):
+        response = self.client.post('/api/payments/mpesa/callback', json=dict(CALLBACK, TransID='  '))
+        self.assertEqual(response.status_code, 400)
+
+
+if __name__ == '__main__':
+    unittest.main()